@@ -0,0 +1,43 @@
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+from models.payment_models import Payment
+from models.subscription_models import Subscription, UserSubscription
+from utils import subscription_status
+
+
+# 🔄 Новая активная подписка вместо текущей (одна активная подписка на пользователя)
+def replace_active_subscription(db: Session, user_id: int, sub: Subscription, payment_id: int | None = None) -> UserSubscription:
+    db.query(UserSubscription).filter_by(user_id=user_id, is_active=True).update({"is_active": False})
+
+    new_sub = UserSubscription(
+        user_id=user_id,
+        subscription_id=sub.id,
+        start_date=datetime.utcnow(),
+        end_date=datetime.utcnow() + timedelta(days=sub.duration_days),
+        remaining_scans=sub.scan_limit,
+        is_active=True,
+        payment_id=payment_id
+    )
+    db.add(new_sub)
+    db.commit()
+
+    # Кэш статуса и счётчик лимита больше не соответствуют подписке
+    subscription_status.subscription_changed(user_id)
+    return new_sub
+
+
+# 💳 Активация подписки по оплаченному платежу
+def activate_subscription_from_payment(user_id: int, payment_id: int, db: Session):
+    payment = db.query(Payment).filter_by(id=payment_id).first()
+    if not payment:
+        print(f"Платёж не найден: payment_id={payment_id}")
+        return
+
+    sub = db.query(Subscription).filter_by(id=payment.subscription_id).first()
+    if not sub:
+        print(f"Подписка не найдена: subscription_id={payment.subscription_id}")
+        return
+
+    print(f"Активация подписки: user_id={user_id}, subscription={sub.name}, scans={sub.scan_limit}")
+    return replace_active_subscription(db, user_id, sub, payment_id=payment.id)
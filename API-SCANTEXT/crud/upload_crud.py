@@ -0,0 +1,16 @@
+from sqlalchemy.orm import Session
+from models.upload_models import Upload
+
+
+# ♻️ Уже распознанный текст для такого же изображения (по sha256 содержимого)
+def get_cached_recognized_text(db: Session, content_hash: str | None) -> str | None:
+    if not content_hash:
+        return None
+
+    row = (
+        db.query(Upload.recognized_text)
+        .filter(Upload.content_hash == content_hash, Upload.recognized_text.isnot(None))
+        .order_by(Upload.id.desc())
+        .first()
+    )
+    return row.recognized_text if row else None
@@ -1,83 +1,141 @@
-from sqlalchemy.orm import Session
-from models import user_models
-from schemas.user_schemas import UserLogin, UserOut, UserCreate
-from utils.security import verify_password, hash_password
-from models.user_models import User
-from sqlalchemy.orm import joinedload
-from models import subscription_models
-from datetime import datetime, timedelta
-
-
-from models.subscription_models import Subscription, UserSubscription
-
-
-# 🔐 Создание нового пользователя с хешированием пароля
-def create_user(db: Session, user: UserCreate):
-    hashed_pw = hash_password(user.password)
-    
-    # 🆕 Создание пользователя
-    db_user = user_models.User(
-        login=user.login,
-        email=user.email,
-        password_hash=hashed_pw
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    # 🔍 Получаем подписку "free"
-    free_sub = db.query(subscription_models.Subscription).filter_by(name="free").first()
-    if not free_sub:
-        raise HTTPException(status_code=500, detail="Подписка 'free' не найдена")
-
-    # 📌 Создаём запись в UserSubscription
-    new_subscription = subscription_models.UserSubscription(
-        user_id=db_user.id,
-        subscription_id=free_sub.id,
-        start_date=datetime.utcnow(),
-        end_date=datetime.utcnow() + timedelta(days=free_sub.duration_days),
-        remaining_scans=free_sub.scan_limit,
-        is_active=True
-    )
-    db.add(new_subscription)
-    db.commit()
-    print(f"✅ Подписка создана: user_id={db_user.id}, subscription_id={free_sub.id}, remaining_scans={free_sub.scan_limit}")
-
-    return db_user
-
-
-def change_password(db: Session, login: str, old_password: str, new_password: str):
-    user = get_user_by_login(db, login)
-    if not user or not verify_password(old_password, user.password_hash):
-        return None
-    user.password_hash = hash_password(new_password)
-    db.commit()
-    return user
-
-def get_user_by_login(db: Session, login: str):
-    user = db.query(User).options(
-        joinedload(User.uploads),
-        joinedload(User.subscriptions).joinedload(UserSubscription.subscription)
-    ).filter(User.login == login).first()
-
-    if user:
-        active_sub = next((s for s in user.subscriptions if s.is_active), None)
-        if active_sub:
-            user.subscription_type = active_sub.subscription.name
-            user.remaining_scans = active_sub.remaining_scans
-        else:
-            user.subscription_type = "none"
-            user.remaining_scans = 0
-
-    return user
-
-def get_all_users(db: Session):
-    return db.query(user_models.User).all()
-
-def delete_user_by_id(db: Session, user_id: int):
-    user = db.query(user_models.User).filter(user_models.User.id == user_id).first()
-    if user:
-        db.delete(user)
-        db.commit()
-        return True
-    return False
+from sqlalchemy.orm import Session
+from models import user_models
+from schemas.user_schemas import UserLogin, UserOut, UserCreate
+from utils.security import verify_password, hash_password
+from utils import stats, subscription_status
+from models.user_models import User
+from models.comment_models import Comment
+from sqlalchemy.orm import load_only
+from sqlalchemy import func, or_, select
+from models import subscription_models
+from datetime import datetime, timedelta
+
+
+from models.subscription_models import Subscription, UserSubscription
+
+
+# 🔐 Создание нового пользователя с хешированием пароля
+# (обработчики передают готовый хеш, посчитанный в пуле процессов — utils/security.py)
+def create_user(db: Session, user: UserCreate, password_hash: str | None = None):
+    hashed_pw = password_hash or hash_password(user.password)
+    
+    # 🆕 Создание пользователя
+    db_user = user_models.User(
+        login=user.login,
+        email=user.email,
+        password_hash=hashed_pw
+    )
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+
+    # 🔍 Получаем подписку "free"
+    free_sub = db.query(subscription_models.Subscription).filter_by(name="free").first()
+    if not free_sub:
+        raise HTTPException(status_code=500, detail="Подписка 'free' не найдена")
+
+    # 📌 Создаём запись в UserSubscription
+    new_subscription = subscription_models.UserSubscription(
+        user_id=db_user.id,
+        subscription_id=free_sub.id,
+        start_date=datetime.utcnow(),
+        end_date=datetime.utcnow() + timedelta(days=free_sub.duration_days),
+        remaining_scans=free_sub.scan_limit,
+        is_active=True
+    )
+    db.add(new_subscription)
+    db.commit()
+    print(f"✅ Подписка создана: user_id={db_user.id}, subscription_id={free_sub.id}, remaining_scans={free_sub.scan_limit}")
+
+    return db_user
+
+
+def change_password(db: Session, login: str, old_password: str, new_password: str):
+    auth = get_user_auth(db, login)
+    if not auth or not verify_password(old_password, auth.password_hash):
+        return None
+    set_password_hash(db, auth.id, hash_password(new_password))
+    return auth
+
+# 👤 Загрузчики пользователя под конкретную задачу — история загрузок не читается ни одним из них
+
+# Есть ли пользователь с таким логином (регистрация)
+def login_exists(db: Session, login: str) -> bool:
+    return db.query(select(User.id).where(User.login == login).exists()).scalar()
+
+# Только то, что нужно для проверки пароля: id, password_hash, is_blocked
+def get_user_auth(db: Session, login: str):
+    return (
+        db.query(User.id, User.password_hash, User.is_blocked)
+        .filter(User.login == login)
+        .first()
+    )
+
+def set_password_hash(db: Session, user_id: int, password_hash: str):
+    db.query(User).filter(User.id == user_id).update({"password_hash": password_hash}, synchronize_session=False)
+    db.commit()
+
+# Профиль + активный тариф (статус подписки — из кэша utils/subscription_status.py)
+def get_user_profile(db: Session, login: str | None = None, user_id: int | None = None):
+    query = db.query(User).options(load_only(User.id, User.login, User.email, User.role, User.is_blocked))
+    query = query.filter(User.id == user_id) if user_id is not None else query.filter(User.login == login)
+    user = query.first()
+
+    if user:
+        status = subscription_status.get_status(db, user.id) or subscription_status.NO_SUBSCRIPTION
+        user.subscription_type = status["subscription_type"]
+        user.remaining_scans = status["remaining_scans"]
+
+    return user
+
+def get_all_users(db: Session):
+    return db.query(user_models.User).all()
+
+# 📋 Пользователи вместе с активным тарифом — одним запросом, с keyset-пагинацией по id
+def get_users_with_active_plan(db: Session, after_id: int | None = None, limit: int = 100,
+                               role: str | None = None, is_blocked: bool | None = None, plan: str | None = None):
+    # Последняя активная подписка пользователя (коррелированный подзапрос — только для строк страницы)
+    active_sub_id = (
+        select(func.max(UserSubscription.id))
+        .where(UserSubscription.user_id == User.id, UserSubscription.is_active == True)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    query = (
+        db.query(
+            User.id, User.login, User.email, User.role, User.is_blocked,
+            Subscription.name.label("subscription_type"),
+            UserSubscription.remaining_scans
+        )
+        .outerjoin(UserSubscription, UserSubscription.id == active_sub_id)
+        .outerjoin(Subscription, Subscription.id == UserSubscription.subscription_id)
+    )
+
+    if after_id is not None:
+        query = query.filter(User.id > after_id)
+    if role is not None:
+        query = query.filter(User.role == role)
+    if is_blocked is not None:
+        query = query.filter(User.is_blocked == is_blocked)
+    if plan is not None:
+        if plan == "free":
+            # Без активной подписки пользователь считается на бесплатном тарифе
+            query = query.filter(or_(Subscription.name == "free", UserSubscription.id.is_(None)))
+        else:
+            query = query.filter(Subscription.name == plan)
+
+    return query.order_by(User.id).limit(limit).all()
+
+def delete_user_by_id(db: Session, user_id: int):
+    user = db.query(user_models.User).filter(user_models.User.id == user_id).first()
+    if user:
+        # Отзывы удаляются каскадом — запоминаем их категории для счётчиков
+        categories = db.execute(
+            select(Comment.category, func.count(Comment.id)).where(Comment.user_id == user_id).group_by(Comment.category)
+        ).all()
+        db.delete(user)
+        db.commit()
+        for category, count in categories:
+            stats.comment_removed(db, category, count)
+        return True
+    return False
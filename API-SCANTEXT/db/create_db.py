@@ -1,5 +1,5 @@
-from db.database import Base, engine
-
-print("🛠 Создание таблиц...")
-Base.metadata.create_all(bind=engine)
-print("✅ База данных создана.")
+from db.migrations import run_migrations
+
+print("🛠 Создание таблиц...")
+run_migrations()
+print("✅ База данных создана.")
@@ -0,0 +1,290 @@
+# 🧱 Версионные миграции схемы БД.
+# Каждая миграция применяется один раз; применённые версии хранятся в таблице schema_migrations.
+# Запуск вручную: python -m db.migrations (API применяет миграции при старте).
+import time
+from datetime import datetime
+
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text, inspect, select, text
+)
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from db.database import engine as default_engine
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", String(100), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+# 🧊 Миграции не используют текущие модели и код приложения: модели меняются дальше,
+# а миграция должна навсегда делать то же, что в момент её написания. Таблицы, индексы
+# и переносы данных описываются внутри миграции.
+def _create_index(conn, name: str, table_name: str, *columns: str, **kwargs):
+    table = Table(table_name, MetaData(), *(Column(column) for column in columns))
+    Index(name, *(table.c[column] for column in columns), **kwargs).create(conn, checkfirst=True)
+
+
+def _references(meta: MetaData, *table_names: str):
+    # Таблицы, на которые ссылаются внешние ключи новой таблицы (сами не создаются)
+    for table_name in table_names:
+        Table(table_name, meta, Column("id", Integer, primary_key=True))
+
+
+# 📸 Схема на момент 0001 — замороженная копия исходных моделей. Модели меняются дальше,
+# а 0001 должна создавать ровно ту схему, которую ожидают следующие миграции (иначе, например,
+# 0002 встретит уже существующую content_hash). Новые таблицы — только отдельными миграциями.
+_baseline = MetaData()
+
+Table(
+    "users", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("login", String(50), unique=True, nullable=False),
+    Column("email", String(100), unique=True, nullable=False),
+    Column("password_hash", String(255), nullable=False),
+    Column("registered_at", DateTime),
+    Column("last_login", DateTime),
+    Column("role", String(50)),
+    Column("is_blocked", Boolean),
+)
+Table(
+    "admin_users", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String(50), unique=True, nullable=False),
+    Column("email", String(255), unique=True, nullable=False),
+    Column("password_hash", String(255), nullable=False),
+    Column("date_registration", DateTime),
+    Column("last_login_date", DateTime),
+)
+Table(
+    "subscriptions", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, unique=True),
+    Column("scan_limit", Integer),
+    Column("price", Integer),
+    Column("duration_days", Integer),
+    Column("description", String, nullable=True),
+)
+Table(
+    "comments", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("email", String(100), nullable=False),
+    Column("review", String(500), nullable=False),
+    Column("service", String(100), nullable=True),
+    Column("category", String(20), nullable=False),
+    Column("date", DateTime),
+)
+Table(
+    "uploads", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("filename", String),
+    Column("file_url", String),
+    Column("recognized_text", Text, nullable=True),
+    Column("uploaded_at", DateTime),
+    Column("user_id", Integer, ForeignKey("users.id")),
+)
+Table(
+    "payments", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("subscription_id", Integer, ForeignKey("subscriptions.id"), nullable=True),
+    Column("amount", Integer, nullable=False),
+    Column("currency", String(10), nullable=False),
+    Column("status", String(50), nullable=False),
+    Column("method", String(50), nullable=False),
+    Column("transaction_id", String(100), nullable=True),
+    Column("timestamp", DateTime),
+)
+Table(
+    "user_subscriptions", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("subscription_id", Integer, ForeignKey("subscriptions.id")),
+    Column("start_date", DateTime),
+    Column("end_date", DateTime),
+    Column("remaining_scans", Integer),
+    Column("is_active", Boolean),
+    Column("auto_renew", Boolean),
+    Column("payment_id", Integer, ForeignKey("payments.id"), nullable=True),
+)
+
+
+# 0001 — исходная схема (для новой БД создаёт все таблицы, существующие не трогает)
+def m0001_initial(conn):
+    _baseline.create_all(bind=conn)
+
+
+# 0002 — sha256 содержимого загрузки
+def m0002_upload_content_hash(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("uploads")}
+    if "content_hash" not in columns:
+        conn.execute(text("ALTER TABLE uploads ADD COLUMN content_hash VARCHAR(64)"))
+    _create_index(conn, "ix_uploads_content_hash", "uploads", "content_hash")
+
+
+# 0003 — индексы для горячих запросов + одна активная подписка на пользователя
+def m0003_hot_path_indexes(conn):
+    # Перед уникальным индексом оставляем активной только последнюю подписку пользователя
+    conn.execute(
+        text(
+            "UPDATE user_subscriptions SET is_active = :inactive "
+            "WHERE is_active = :active AND id NOT IN ("
+            "SELECT MAX(id) FROM user_subscriptions WHERE is_active = :active GROUP BY user_id)"
+        ),
+        {"active": True, "inactive": False}
+    )
+
+    _create_index(conn, "ix_user_subscriptions_user_active", "user_subscriptions", "user_id", "is_active")
+    _create_index(
+        conn, "uq_user_subscriptions_one_active", "user_subscriptions", "user_id", unique=True,
+        sqlite_where=text("is_active = 1"), postgresql_where=text("is_active")
+    )
+    _create_index(conn, "ix_payments_transaction_id", "payments", "transaction_id")
+    _create_index(conn, "ix_payments_user_status_timestamp", "payments", "user_id", "status", "timestamp")
+    _create_index(conn, "ix_uploads_user_uploaded_at", "uploads", "user_id", "uploaded_at")
+
+
+# 0004 — отозванные токены доступа
+def m0004_revoked_tokens(conn):
+    Table(
+        "revoked_tokens", MetaData(),
+        Column("jti", String(32), primary_key=True),
+        Column("subject", String(60), nullable=False),
+        Column("expires_at", DateTime, nullable=False, index=True),
+        Column("revoked_at", DateTime),
+    ).create(conn, checkfirst=True)
+
+
+# 0005 — агрегаты для админ-панели + индексы для пересчёта по датам; заполняем по существующим данным
+def m0005_stats_rollups(conn):
+    meta = MetaData()
+    Table(
+        "stats_daily_user_activity", meta,
+        Column("day", Date, primary_key=True),
+        Column("user_id", Integer, primary_key=True),
+        Column("uploads", Integer, nullable=False),
+        Column("scans", Integer, nullable=False),
+    )
+    Table(
+        "stats_daily_revenue", meta,
+        Column("day", Date, primary_key=True),
+        Column("subscription_id", Integer, primary_key=True),
+        Column("currency", String(10), primary_key=True),
+        Column("payments", Integer, nullable=False),
+        Column("amount", Integer, nullable=False),
+    )
+    Table(
+        "stats_daily_plan_mix", meta,
+        Column("day", Date, primary_key=True),
+        Column("subscription_id", Integer, primary_key=True),
+        Column("active", Integer, nullable=False),
+    )
+    Table(
+        "stats_comment_categories", meta,
+        Column("category", String(20), primary_key=True),
+        Column("count", Integer, nullable=False),
+        Column("updated_at", DateTime),
+    )
+    meta.create_all(bind=conn)
+
+    _create_index(conn, "ix_uploads_uploaded_at", "uploads", "uploaded_at")
+    _create_index(conn, "ix_payments_status_timestamp", "payments", "status", "timestamp")
+
+    # Заполнение по существующим данным (снимок активных подписок — только на сегодня)
+    now = datetime.utcnow()
+    for statement in (
+        "DELETE FROM stats_daily_user_activity",
+        "INSERT INTO stats_daily_user_activity (day, user_id, uploads, scans) "
+        "SELECT DATE(uploaded_at), user_id, COUNT(id), COUNT(recognized_text) FROM uploads "
+        "WHERE user_id IS NOT NULL AND uploaded_at IS NOT NULL GROUP BY DATE(uploaded_at), user_id",
+        "DELETE FROM stats_daily_revenue",
+        "INSERT INTO stats_daily_revenue (day, subscription_id, currency, payments, amount) "
+        "SELECT DATE(timestamp), COALESCE(subscription_id, 0), currency, COUNT(id), COALESCE(SUM(amount), 0) FROM payments "
+        "WHERE status = 'success' AND timestamp IS NOT NULL GROUP BY DATE(timestamp), COALESCE(subscription_id, 0), currency",
+        "DELETE FROM stats_daily_plan_mix WHERE day = :today",
+        "INSERT INTO stats_daily_plan_mix (day, subscription_id, active) "
+        "SELECT :today, subscription_id, COUNT(id) FROM user_subscriptions "
+        "WHERE is_active = :active AND subscription_id IS NOT NULL GROUP BY subscription_id",
+        "DELETE FROM stats_comment_categories",
+        "INSERT INTO stats_comment_categories (category, count, updated_at) "
+        "SELECT category, COUNT(id), :now FROM comments GROUP BY category",
+    ):
+        conn.execute(text(statement), {"today": now.date(), "now": now, "active": True})
+
+
+# 0006 — полнотекстовый индекс по recognized_text (FTS5 / tsvector + GIN), заполняется сразу
+def m0006_upload_search(conn):
+    from utils import search
+
+    search.create_index(conn)
+
+
+# 0007 — очередь OCR-задач (раньше таблицу создавала 0001 по текущим моделям)
+def m0007_ocr_jobs(conn):
+    meta = MetaData()
+    _references(meta, "users", "uploads", "user_subscriptions")
+    table = Table(
+        "ocr_jobs", meta,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("upload_id", Integer, ForeignKey("uploads.id"), nullable=False),
+        Column("user_id", Integer, ForeignKey("users.id"), nullable=True),
+        Column("user_subscription_id", Integer, ForeignKey("user_subscriptions.id"), nullable=True),
+        Column("status", String(20), nullable=False, index=True),
+        Column("recognized_text", Text, nullable=True),
+        Column("error", String(500), nullable=True),
+        Column("attempts", Integer, nullable=False),
+        Column("created_at", DateTime),
+        Column("started_at", DateTime, nullable=True),
+        Column("finished_at", DateTime, nullable=True),
+    )
+    table.create(conn, checkfirst=True)
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    ("0001_initial", m0001_initial),
+    ("0002_upload_content_hash", m0002_upload_content_hash),
+    ("0003_hot_path_indexes", m0003_hot_path_indexes),
+    ("0004_revoked_tokens", m0004_revoked_tokens),
+    ("0005_stats_rollups", m0005_stats_rollups),
+    ("0006_upload_search", m0006_upload_search),
+    ("0007_ocr_jobs", m0007_ocr_jobs),
+]
+
+
+def _apply_pending(engine):
+    _meta.create_all(bind=engine)
+
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    for version, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        print(f"🛠 Миграция {version}...")
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
+
+
+def run_migrations(engine=default_engine, attempts: int = 5):
+    # Несколько воркеров стартуют одновременно и применяют миграции наперегонки:
+    # проигравший получает ошибку, ждёт и перечитывает список уже применённых версий
+    for attempt in range(attempts):
+        try:
+            _apply_pending(engine)
+            return
+        except (IntegrityError, OperationalError) as e:
+            if attempt == attempts - 1:
+                raise
+            print(f"⚠️ Миграции применяет другой процесс ({type(e).__name__}), повтор...")
+            time.sleep(1 + attempt)
+
+
+if __name__ == "__main__":
+    run_migrations()
+    print("✅ Схема БД актуальна.")
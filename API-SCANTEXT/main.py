@@ -1,92 +1,90 @@
-import logging
-
-from fastapi.staticfiles import StaticFiles
-from fastapi import FastAPI, UploadFile, File, Depends, Form, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import Optional, List
-import io
-from datetime import datetime
-import os
-from pathlib import Path
-from dotenv import load_dotenv
-from PIL import Image
-
-# 🔗 Импорт модулей проекта
-from routers import user, admin, comment
-from db.database import SessionLocal, engine
-from crud import admin_crud
-from schemas import admin_schemas
-from models import admin_models, user_models, comment_models, upload_models, subscription_models
-#from models.user_models import Upload, User
-from models.user_models import User
-from routers import subscription
-from routers import upload
-from routers import payment
-from models.upload_models import Upload
-
-
-# 🔄 Загрузка переменных окружения (.env)
-load_dotenv()
-
-# 🔨 Создание таблиц в БД
-admin_models.Base.metadata.create_all(bind=engine)
-user_models.Base.metadata.create_all(bind=engine)
-comment_models.Base.metadata.create_all(bind=engine)
-
-# 🧠 Инициализация FastAPI
-app = FastAPI()
-
-# ✅ Разрешаем доступ с React (CORS)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# ⚙️ Получение сессии БД
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# 🚀 Подключение маршрутов
-app.include_router(user.router, prefix="/user", tags=["User"])
-app.include_router(admin.router, prefix="/admin", tags=["Admin"])
-app.include_router(comment.router, prefix="/comments", tags=["Comments"])
-app.include_router(upload.router, prefix="/upload", tags=["Uploads"])
-app.include_router(subscription.router, prefix="/subscriptions", tags=["Subscriptions"])
-app.include_router(payment.router, prefix="/payment", tags=["Payments"])
-
-# Раздача загруженных файлов
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-
-
-# ✅ Общая функция для сохранения распознанного файла
-def save_upload_to_db(db: Session, text: str, image: Image.Image, user: Optional[User] = None) -> Upload:
-    os.makedirs("uploads", exist_ok=True)
-    filename = f"scan_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.jpg"
-    filepath = os.path.join("uploads", filename)
-    image.save(filepath)
-
-    upload = Upload(
-        filename=filename,
-        uploaded_at=datetime.utcnow(),
-        recognized_text=text,
-        file_url=f"http://localhost:8000/uploads/{filename}",
-        user_id=user.id if user else None
-    )
-    db.add(upload)
-    db.commit()
-    db.refresh(upload)
-    return upload
-
-# 🔘 Корневой тест
-@app.get("/")
-def root():
-    return {"message": "👋 Добро пожаловать в ScanText API"}
-
+import logging
+
+from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, UploadFile, File, Depends, Form, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from typing import List
+import io
+from pathlib import Path
+from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+
+# 🔄 Загрузка переменных окружения (.env) — до импорта модулей, которые читают настройки
+load_dotenv()
+
+# 🔗 Импорт модулей проекта
+from routers import user, admin, comment
+from db.database import engine, dispose_async_engine, QueryCounter, current_query_counter, DB_QUERY_WARN_THRESHOLD
+from db.migrations import run_migrations
+from crud import admin_crud
+from schemas import admin_schemas
+from models import admin_models, user_models, comment_models, upload_models, subscription_models, ocr_job_models, auth_models, stats_models
+#from models.user_models import Upload, User
+from routers import subscription
+from routers import upload
+from routers import payment
+from utils import ocr_backends, ocr_cache, ocr_jobs, image_preprocessing, quota, security, stats, storage
+
+
+# 🔨 Создание/обновление таблиц в БД через миграции (db/migrations.py)
+run_migrations(engine)
+
+# ♻️ Жизненный цикл приложения: воркеры OCR-очереди, OCR-бэкенд и кэш, пулы процессов, сброс счётчика лимитов, пересчёт статистики
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ocr_jobs.start_workers()
+    await quota.start_flusher()
+    await stats.start_refresher()
+    yield
+    await ocr_jobs.stop_workers()
+    await quota.stop_flusher()
+    await stats.stop_refresher()
+    await ocr_backends.close_backend()
+    ocr_cache.disk_cache.close()
+    image_preprocessing.shutdown_pool()
+    security.shutdown_pool()
+    await dispose_async_engine()
+
+# 🧠 Инициализация FastAPI
+app = FastAPI(lifespan=lifespan)
+
+# ✅ Разрешаем доступ с React (CORS)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-DB-Queries"],
+)
+
+# 🔢 Сколько SQL-запросов сделал обработчик: заголовок X-DB-Queries + предупреждение в лог (ловим N+1)
+@app.middleware("http")
+async def count_db_queries(request: Request, call_next):
+    counter = QueryCounter()
+    token = current_query_counter.set(counter)
+    try:
+        response = await call_next(request)
+    finally:
+        current_query_counter.reset(token)
+    response.headers["X-DB-Queries"] = str(counter.count)
+    if counter.count > DB_QUERY_WARN_THRESHOLD:
+        print(f"⚠️ {request.method} {request.url.path}: {counter.count} SQL-запросов")
+    return response
+
+# 🚀 Подключение маршрутов
+app.include_router(user.router, prefix="/user", tags=["User"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
+app.include_router(comment.router, prefix="/comments", tags=["Comments"])
+app.include_router(upload.router, prefix="/upload", tags=["Uploads"])
+app.include_router(subscription.router, prefix="/subscriptions", tags=["Subscriptions"])
+app.include_router(payment.router, prefix="/payment", tags=["Payments"])
+
+# Раздача загруженных файлов из локального хранилища (при STORAGE_BACKEND=s3 файлы отдаёт бакет)
+app.mount("/uploads", StaticFiles(directory=storage.UPLOAD_FOLDER, check_dir=False), name="uploads")
+
+# 🔘 Корневой тест
+@app.get("/")
+def root():
+    return {"message": "👋 Добро пожаловать в ScanText API"}
+
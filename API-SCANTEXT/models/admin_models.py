@@ -1,14 +1,14 @@
-from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
-from datetime import datetime
-from db.database import Base
-
-class AdminUser(Base):
-    __tablename__ = "admin_users"
-
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String(50), unique=True, nullable=False)
-    email = Column(String(255), unique=True, nullable=False)
-    password_hash = Column(String(255), nullable=False)
-    date_registration = Column(DateTime, default=datetime.utcnow)
+from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from datetime import datetime
+from db.database import Base
+
+class AdminUser(Base):
+    __tablename__ = "admin_users"
+
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(50), unique=True, nullable=False)
+    email = Column(String(255), unique=True, nullable=False)
+    password_hash = Column(String(255), nullable=False)
+    date_registration = Column(DateTime, default=datetime.utcnow)
     last_login_date = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
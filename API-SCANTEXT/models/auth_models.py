@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+from db.database import Base
+
+# 🚫 Отозванные токены (выход из системы, ротация refresh-токена).
+# Хранятся только до истечения срока самого токена.
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(32), primary_key=True)
+    subject = Column(String(60), nullable=False)  # "user:14", "admin:1"
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow)
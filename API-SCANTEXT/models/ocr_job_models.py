@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from db.database import Base
+
+class OcrJob(Base):
+    __tablename__ = "ocr_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    upload_id = Column(Integer, ForeignKey("uploads.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    user_subscription_id = Column(Integer, ForeignKey("user_subscriptions.id"), nullable=True)
+    status = Column(String(20), default="queued", nullable=False, index=True)  # queued, running, done, failed
+    recognized_text = Column(Text, nullable=True)
+    error = Column(String(500), nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    upload = relationship("Upload")
@@ -1,20 +1,28 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
-from db.database import Base
-from datetime import datetime
-
-class Payment(Base):
-    __tablename__ = "payments"
-
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    subscription_id = Column(Integer, ForeignKey("subscriptions.id"), nullable=True)
-    amount = Column(Integer, nullable=False)
-    currency = Column(String(10), default="UAH", nullable=False)
-    status = Column(String(50), default="pending", nullable=False)
-    method = Column(String(50), default="monobank", nullable=False)
-    transaction_id = Column(String(100), nullable=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
-
-    user = relationship("User", back_populates="payments")
-    subscription = relationship("Subscription", backref="payments")
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from db.database import Base
+from datetime import datetime
+
+class Payment(Base):
+    __tablename__ = "payments"
+    __table_args__ = (
+        # /payment/success ищет платёж по orderId
+        Index("ix_payments_transaction_id", "transaction_id"),
+        # /payment/confirm-latest-payment: последний pending-платёж пользователя
+        Index("ix_payments_user_status_timestamp", "user_id", "status", "timestamp"),
+        # Выручка за последние дни (utils/stats.py)
+        Index("ix_payments_status_timestamp", "status", "timestamp"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    subscription_id = Column(Integer, ForeignKey("subscriptions.id"), nullable=True)
+    amount = Column(Integer, nullable=False)
+    currency = Column(String(10), default="UAH", nullable=False)
+    status = Column(String(50), default="pending", nullable=False)
+    method = Column(String(50), default="monobank", nullable=False)
+    transaction_id = Column(String(100), nullable=True)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+    user = relationship("User", back_populates="payments")
+    subscription = relationship("Subscription", backref="payments")
@@ -0,0 +1,44 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime
+from datetime import datetime
+from db.database import Base
+
+# 📊 Агрегаты для админ-панели (utils/stats.py). Пересчитываются из исходных таблиц —
+# их можно в любой момент удалить и построить заново (POST /admin/stats/rebuild).
+
+# Загрузки и распознанные загрузки за день по пользователю
+class DailyUserActivity(Base):
+    __tablename__ = "stats_daily_user_activity"
+
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    uploads = Column(Integer, default=0, nullable=False)
+    scans = Column(Integer, default=0, nullable=False)
+
+
+# Успешные платежи за день по тарифу (subscription_id = 0 — платёж без тарифа)
+class DailyRevenue(Base):
+    __tablename__ = "stats_daily_revenue"
+
+    day = Column(Date, primary_key=True)
+    subscription_id = Column(Integer, primary_key=True)
+    currency = Column(String(10), primary_key=True)
+    payments = Column(Integer, default=0, nullable=False)
+    amount = Column(Integer, default=0, nullable=False)
+
+
+# Снимок активных подписок по тарифу на день
+class DailyPlanMix(Base):
+    __tablename__ = "stats_daily_plan_mix"
+
+    day = Column(Date, primary_key=True)
+    subscription_id = Column(Integer, primary_key=True)
+    active = Column(Integer, default=0, nullable=False)
+
+
+# Отзывы по категориям (увеличивается при каждом новом отзыве)
+class CommentCategoryCount(Base):
+    __tablename__ = "stats_comment_categories"
+
+    category = Column(String(20), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -1,16 +1,23 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
-from sqlalchemy.orm import relationship
-from datetime import datetime
-from db.database import Base
-
-class Upload(Base):
-    __tablename__ = "uploads"
-
-    id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String)
-    file_url = Column(String)
-    recognized_text = Column(Text, nullable=True)
-    uploaded_at = Column(DateTime, default=datetime.utcnow)
-    user_id = Column(Integer, ForeignKey("users.id"))
-
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from db.database import Base
+
+class Upload(Base):
+    __tablename__ = "uploads"
+    __table_args__ = (
+        # История сканов пользователя: WHERE user_id = ? ORDER BY uploaded_at DESC
+        Index("ix_uploads_user_uploaded_at", "user_id", "uploaded_at"),
+        # Пересчёт статистики за последние дни (utils/stats.py)
+        Index("ix_uploads_uploaded_at", "uploaded_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String)
+    file_url = Column(String)
+    content_hash = Column(String(64), nullable=True, index=True)  # sha256 содержимого
+    recognized_text = Column(Text, nullable=True)
+    uploaded_at = Column(DateTime, default=datetime.utcnow)
+    user_id = Column(Integer, ForeignKey("users.id"))
+
     user = relationship("User", back_populates="uploads", cascade="all, delete")
\ No newline at end of file
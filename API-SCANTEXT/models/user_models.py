@@ -1,20 +1,20 @@
-from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
-from datetime import datetime
-from db.database import Base
-
-class User(Base):
-    __tablename__ = "users"
-
-    id = Column(Integer, primary_key=True, index=True)
-    login = Column(String(50), unique=True, nullable=False)
-    email = Column(String(100), unique=True, nullable=False)
-    password_hash = Column(String(255), nullable=False)
-    registered_at = Column(DateTime, default=datetime.utcnow)
-    last_login = Column(DateTime, default=datetime.utcnow)
-    role = Column(String(50), default="user")
-    is_blocked = Column(Boolean, default=False)
-    payments = relationship("Payment", back_populates="user", cascade="all, delete-orphan")
-    comments = relationship("Comment", back_populates="user", cascade="all, delete")
-    uploads = relationship("Upload", back_populates="user", cascade="all, delete")
+from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from datetime import datetime
+from db.database import Base
+
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, index=True)
+    login = Column(String(50), unique=True, nullable=False)
+    email = Column(String(100), unique=True, nullable=False)
+    password_hash = Column(String(255), nullable=False)
+    registered_at = Column(DateTime, default=datetime.utcnow)
+    last_login = Column(DateTime, default=datetime.utcnow)
+    role = Column(String(50), default="user")
+    is_blocked = Column(Boolean, default=False)
+    payments = relationship("Payment", back_populates="user", cascade="all, delete-orphan")
+    comments = relationship("Comment", back_populates="user", cascade="all, delete")
+    uploads = relationship("Upload", back_populates="user", cascade="all, delete")
     subscriptions = relationship("UserSubscription", backref="user", cascade="all, delete")
\ No newline at end of file
@@ -1,68 +1,151 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from sqlalchemy.orm import joinedload
-
-from db.database import SessionLocal
-from crud import admin_crud
-from schemas import admin_schemas
-from models import admin_models
-from utils.security import verify_password  # 🔑 импорт хеш-проверки
-
-router = APIRouter()
-
-# 📦 Получить доступ к БД
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# ✅ Создание администратора
-@router.post("/create", response_model=admin_schemas.AdminUserOut)
-def create_admin(admin: admin_schemas.AdminUserCreate, db: Session = Depends(get_db)):
-    return admin_crud.create_admin_user(db, admin)
-
-# 🔐 Авторизация администратора
-#@router.post("/login", response_model=admin_schemas.AdminUserOut)
-#def login_admin(credentials: admin_schemas.AdminLogin, db: Session = Depends(get_db)):
-#    admin = admin_crud.get_admin_user_by_username(db, credentials.username)
-#    if not admin or not verify_password(credentials.password, admin.password_hash):
-#        raise HTTPException(status_code=401, detail="Неверный логин или пароль")
-#    return admin
-
-
-@router.post("/login", response_model=admin_schemas.AdminUserOut)
-def login_admin(credentials: admin_schemas.AdminLogin, db: Session = Depends(get_db)):
-    print(f"🔐 Попытка входа: {credentials.username}")  # ЛОГ
-
-    admin = admin_crud.get_admin_user_by_username(db, credentials.username)
-    if not admin:
-        print("❌ Админ не найден в базе")  # ЛОГ
-        raise HTTPException(status_code=401, detail="Неверный логин или пароль")
-
-    if not verify_password(credentials.password, admin.password_hash):
-        print("❌ Неверный пароль")  # ЛОГ
-        raise HTTPException(status_code=401, detail="Неверный логин или пароль")
-
-    print(f"✅ Успешный вход: {admin.username}")  # ЛОГ
-    return admin
-
-
-# 📋 Все админы
-@router.get("/all", response_model=list[admin_schemas.AdminUserOut])
-def get_all_admins(db: Session = Depends(get_db)):
-    return admin_crud.get_all_admins(db)
-
-# 📊 Статистика загрузок
-@router.get("/{admin_id}/stats")
-def get_admin_stats(admin_id: int, db: Session = Depends(get_db)):
-    count = db.query(func.count(admin_models.Upload.id)).filter(admin_models.Upload.admin_id == admin_id).scalar()
-    return {"upload_count": count}
-
-#
-@router.post("/activate-subscription")
-def activate_subscription(user_id: int, payment_id: int, db: Session = Depends(get_db)):
-    activate_subscription_from_payment(user_id=user_id, payment_id=payment_id, db=db)
-    return {"message": "Подписка успешно активирована"}
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import get_db, get_read_db, get_async_db
+from crud import admin_crud
+from crud.subscription_crud import activate_subscription_from_payment
+from schemas import admin_schemas
+from models import admin_models
+from utils.security import hash_password_async, verify_and_update_async  # 🔑 хеширование в пуле процессов
+from utils.pagination import PageParams, paginate
+from utils import auth as auth_tokens
+from utils import stats
+from schemas.user_schemas import TokenPair, RefreshRequest, LogoutRequest
+from fastapi.security import HTTPAuthorizationCredentials
+from typing import Optional
+
+router = APIRouter()
+
+# ✅ Создание администратора
+@router.post("/create", response_model=admin_schemas.AdminUserOut)
+async def create_admin(admin: admin_schemas.AdminUserCreate, db: AsyncSession = Depends(get_async_db)):
+    password_hash = await hash_password_async(admin.password)
+    return await db.run_sync(lambda session: admin_crud.create_admin_user(session, admin, password_hash=password_hash))
+
+# 🔐 Авторизация администратора
+#@router.post("/login", response_model=admin_schemas.AdminUserOut)
+#def login_admin(credentials: admin_schemas.AdminLogin, db: Session = Depends(get_db)):
+#    admin = admin_crud.get_admin_user_by_username(db, credentials.username)
+#    if not admin or not verify_password(credentials.password, admin.password_hash):
+#        raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+#    return admin
+
+
+@router.post("/login", response_model=admin_schemas.AdminLoginOut)
+async def login_admin(credentials: admin_schemas.AdminLogin, db: AsyncSession = Depends(get_async_db)):
+    print(f"🔐 Попытка входа: {credentials.username}")  # ЛОГ
+
+    admin = await db.run_sync(lambda session: admin_crud.get_admin_user_by_username(session, credentials.username))
+    if not admin:
+        print("❌ Админ не найден в базе")  # ЛОГ
+        raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+    # Всё нужное для ответа — до rollback (он сбрасывает загруженные атрибуты)
+    admin_out = admin_schemas.AdminUserOut.model_validate(admin).model_dump()
+    password_hash = admin.password_hash
+    await db.rollback()  # отпускаем соединение в пул на время bcrypt
+
+    valid, new_hash = await verify_and_update_async(credentials.password, password_hash)
+    if not valid:
+        print("❌ Неверный пароль")  # ЛОГ
+        raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+    if new_hash:
+        # Хеш со старой стоимостью bcrypt — обновляем при успешном входе
+        await db.execute(
+            update(admin_models.AdminUser)
+            .where(admin_models.AdminUser.id == admin_out["id"])
+            .values(password_hash=new_hash)
+        )
+        await db.commit()
+
+    print(f"✅ Успешный вход: {admin_out['username']}")  # ЛОГ
+    return admin_schemas.AdminLoginOut(
+        **admin_out,
+        **auth_tokens.issue_tokens("admin", admin_out["id"], admin_out["username"], "admin")
+    )
+
+# 🔁 Новая пара токенов администратора по refresh-токену
+@router.post("/refresh", response_model=TokenPair)
+def refresh_admin_tokens(data: RefreshRequest, db: Session = Depends(get_db)):
+    claims = auth_tokens.use_refresh_token(db, data.refresh_token, "admin")
+    if not db.query(admin_models.AdminUser.id).filter(admin_models.AdminUser.id == claims["sub"]).first():
+        raise HTTPException(status_code=401, detail="Администратор недоступен")
+    return auth_tokens.issue_tokens("admin", claims["sub"], claims["login"], "admin")
+
+# 🚪 Выход администратора
+@router.post("/logout")
+def logout_admin(
+    data: Optional[LogoutRequest] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(auth_tokens.bearer),
+    current: auth_tokens.CurrentUser = Depends(auth_tokens.get_current_admin),
+    db: Session = Depends(get_db)
+):
+    auth_tokens.logout(db, current, credentials.credentials, data.refresh_token if data else None)
+    return {"message": "Вы вышли из системы"}
+
+
+# 📋 Все админы
+@router.get("/all", response_model=list[admin_schemas.AdminUserOut])
+def get_all_admins(response: Response, page: PageParams = Depends(), db: Session = Depends(get_read_db)):
+    query = db.query(admin_models.AdminUser)
+    return paginate(query, page, response, (admin_models.AdminUser.date_registration, admin_models.AdminUser.id), admin_schemas.AdminUserOut)
+
+# 📊 Статистика для админ-панели — из таблиц агрегатов (utils/stats.py), без сканов исходных таблиц.
+# Период: ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD (по умолчанию — последние 30 дней)
+@router.get("/stats/uploads")
+def get_upload_stats(
+    user_id: Optional[int] = None,
+    period: stats.DateRange = Depends(),
+    current: auth_tokens.CurrentUser = Depends(auth_tokens.get_current_admin),
+    db: Session = Depends(get_read_db)
+):
+    return stats.activity_by_day(db, period, user_id)
+
+@router.get("/stats/uploads/top-users")
+def get_top_users_stats(
+    limit: int = Query(20, ge=1, le=200),
+    period: stats.DateRange = Depends(),
+    current: auth_tokens.CurrentUser = Depends(auth_tokens.get_current_admin),
+    db: Session = Depends(get_read_db)
+):
+    return stats.top_users(db, period, limit)
+
+@router.get("/stats/revenue")
+def get_revenue_stats(
+    period: stats.DateRange = Depends(),
+    current: auth_tokens.CurrentUser = Depends(auth_tokens.get_current_admin),
+    db: Session = Depends(get_read_db)
+):
+    return stats.revenue_by_day(db, period)
+
+@router.get("/stats/plans")
+def get_plan_mix_stats(
+    period: stats.DateRange = Depends(),
+    current: auth_tokens.CurrentUser = Depends(auth_tokens.get_current_admin),
+    db: Session = Depends(get_read_db)
+):
+    return stats.plan_mix_by_day(db, period)
+
+@router.get("/stats/comments")
+def get_comment_category_stats(
+    current: auth_tokens.CurrentUser = Depends(auth_tokens.get_current_admin),
+    db: Session = Depends(get_read_db)
+):
+    return stats.comment_categories(db)
+
+# 🔄 Полный пересчёт агрегатов (после ручных правок в БД)
+@router.post("/stats/rebuild")
+def rebuild_stats(
+    current: auth_tokens.CurrentUser = Depends(auth_tokens.get_current_admin),
+    db: Session = Depends(get_db)
+):
+    stats.rebuild(db)
+    return {"message": "Статистика пересчитана"}
+
+#
+@router.post("/activate-subscription")
+def activate_subscription(user_id: int, payment_id: int, db: Session = Depends(get_db)):
+    activate_subscription_from_payment(user_id=user_id, payment_id=payment_id, db=db)
+    return {"message": "Подписка успешно активирована"}
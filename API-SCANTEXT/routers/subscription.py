@@ -1,66 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import List
-
-# Импорты моделей и схем
-from db.database import get_db
-from models.subscription_models import Subscription, UserSubscription
-from models.user_models import User
-from models.payment_models import Payment
-from schemas.subscription_schemas import SubscriptionOut, SubscriptionShort
-from schemas.user_schemas import UserOut
-from sqlalchemy.orm import joinedload
-
-
-
-router = APIRouter()
-
-@router.get("/", response_model=List[SubscriptionOut])
-def get_subscriptions(db: Session = Depends(get_db)):
-    return db.query(Subscription).all()
-
-def activate_subscription_from_payment(user_id: int, payment_id: int, db: Session):
-    payment = db.query(Payment).filter_by(id=payment_id).first()
-    sub = db.query(Subscription).filter_by(id=payment.subscription_id).first()
-
-    db.query(UserSubscription).filter_by(user_id=user_id, is_active=True).update({"is_active": False})
-
-    new_sub = UserSubscription(
-        user_id=user_id,
-        subscription_id=sub.id,
-        start_date=datetime.utcnow(),
-        end_date=datetime.utcnow() + timedelta(days=sub.duration_days),
-        remaining_scans=sub.scan_limit,
-        is_active=True,
-        payment_id=payment.id
-    )
-    db.add(new_sub)
-    db.commit()
-
-@router.post("/activate-subscription")
-def activate_subscription(user_id: int, payment_id: int, db: Session = Depends(get_db)):
-    activate_subscription_from_payment(user_id=user_id, payment_id=payment_id, db=db)
-    return {"message": "Подписка успешно активирована"}
-
-@router.get("/subscription-info")
-def get_subscription_info(login: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter_by(login=login).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
-
-    user_sub = (
-        db.query(UserSubscription)
-        .options(joinedload(UserSubscription.subscription))  # подтягиваем связку
-        .filter_by(user_id=user.id, is_active=True)
-        .first()
-    )
-
-    if not user_sub:
-        return {"subscription_type": "none", "remaining_scans": 0}
-
-    return {
-        "subscription_type": user_sub.subscription.name,
-        "remaining_scans": user_sub.remaining_scans
-    }
-
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+# Импорты моделей и схем
+from db.database import get_db, get_read_db
+from models.subscription_models import Subscription, UserSubscription
+from models.user_models import User
+from models.payment_models import Payment
+from schemas.subscription_schemas import SubscriptionOut, SubscriptionShort
+from schemas.user_schemas import UserOut
+from sqlalchemy.orm import joinedload
+from crud.subscription_crud import activate_subscription_from_payment
+from utils import subscription_status
+from utils import auth as auth_tokens
+from utils.pagination import PageParams, paginate
+
+
+
+router = APIRouter()
+
+@router.get("/", response_model=List[SubscriptionOut], response_model_exclude_unset=True)
+def get_subscriptions(response: Response, page: PageParams = Depends(), db: Session = Depends(get_read_db)):
+    # У тарифов нет даты — курсор по id, порядок как раньше (по возрастанию)
+    return paginate(db.query(Subscription), page, response, (Subscription.id,), SubscriptionOut, descending=False)
+
+@router.post("/activate-subscription")
+def activate_subscription(user_id: int, payment_id: int, db: Session = Depends(get_db)):
+    activate_subscription_from_payment(user_id=user_id, payment_id=payment_id, db=db)
+    return {"message": "Подписка успешно активирована"}
+
+@router.get("/subscription-info")
+def get_subscription_info(
+    login: Optional[str] = None,
+    current: Optional[auth_tokens.CurrentUser] = Depends(auth_tokens.get_optional_user),
+    db: Session = Depends(get_db)
+):
+    # Пользователь — из токена (login — для старых клиентов)
+    user_id = auth_tokens.resolve_user_id(db, current, login)
+    return subscription_status.get_status(db, user_id) or subscription_status.NO_SUBSCRIPTION
+
+# 📊 Попадания/промахи кэша статуса подписки
+@router.get("/cache-stats")
+def get_cache_stats():
+    return subscription_status.stats()
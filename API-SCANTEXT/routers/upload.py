@@ -1,89 +1,443 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
-from sqlalchemy.orm import Session
-from datetime import datetime
-import uuid
-import os
-import requests
-from db.database import get_db
-from models.user_models import User
-from models.upload_models import Upload
-from schemas.upload_schemas import UploadOut
-from models.subscription_models import UserSubscription, Subscription
-
-
-router = APIRouter()
-UPLOAD_FOLDER = "uploads"
-
-@router.post("/upload-image")
-async def upload_image(file: UploadFile = File(...), login: str = Form(...), db: Session = Depends(get_db)):
-    user = db.query(User).filter_by(login=login).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    filename = f"{uuid.uuid4().hex}_{file.filename}"
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
-
-    file_url = f"http://localhost:8000/uploads/{filename}"
-
-    upload = Upload(
-        filename=filename,
-        file_url=file_url,
-        user_id=user.id,
-        uploaded_at=datetime.utcnow(),
-        recognized_text=None
-    )
-    db.add(upload)
-    db.commit()
-    db.refresh(upload)
-    return {"upload_id": upload.id, "file_url": file_url}
-
-@router.post("/scan")
-def scan_image(upload_id: int = Form(...), db: Session = Depends(get_db)):
-    upload = db.query(Upload).filter_by(id=upload_id).first()
-    if not upload:
-        raise HTTPException(status_code=404, detail="Upload not found")
-
-    user = upload.user  # получаем пользователя через relationship
-
-    # Проверка лимита сканирований
-    user_sub = db.query(UserSubscription).filter_by(user_id=user.id, is_active=True).first()
-    if not user_sub or user_sub.remaining_scans <= 0:
-        raise HTTPException(status_code=403, detail="Лимит сканирований исчерпан")
-
-    user_sub.remaining_scans -= 1
-
-    file_path = os.path.join(UPLOAD_FOLDER, upload.filename)
-    with open(file_path, "rb") as f:
-        image_bytes = f.read()
-
-    response = requests.post(
-    "https://fastapitext.fly.dev/extract-text/",
-    files={"file": ("file.jpg", image_bytes)}
-)
-    text = response.json().get("text", "")
-    print("📩 Ответ от OCR API:", response.json())
-
-
-    upload.recognized_text = text
-    db.commit()
-
-    return {
-        "recognized_text": text,
-        "subscription_type": user_sub.subscription.name,
-        "remaining_scans": user_sub.remaining_scans
-    }
-
-
-
-@router.get("/uploads/by-user", response_model=list[UploadOut])
-def get_uploads_by_user(login: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter_by(login=login).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    uploads = db.query(Upload).filter_by(user_id=user.id).order_by(Upload.uploaded_at.desc()).all()
-    return uploads
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List, Optional
+import anyio
+import asyncio
+import json
+import os
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.database import SessionLocal, get_db, get_read_db, get_async_db
+from models.user_models import User
+from models.upload_models import Upload
+from schemas.upload_schemas import UploadOut, OcrJobOut, UploadSearchHit
+from models.subscription_models import UserSubscription, Subscription
+from models.ocr_job_models import OcrJob
+from crud import upload_crud
+from utils import ocr_cache, ocr_client, ocr_jobs, quota, search, stats, storage, subscription_status, thumbnails
+from utils.ocr_service import extract_text
+from utils.uploads import save_upload_file, upload_file_url, read_upload_bytes
+from utils.pagination import PageParams, paginate
+from utils import auth as auth_tokens
+
+
+router = APIRouter()
+
+# Максимум страниц в одном пакетном сканировании
+SCAN_BATCH_MAX_PAGES = int(os.getenv("SCAN_BATCH_MAX_PAGES", "50"))
+# Интервал пинга в потоке /scan-batch/stream, секунды
+SCAN_STREAM_PING_SECONDS = float(os.getenv("SCAN_STREAM_PING_SECONDS", "15"))
+
+@router.post("/upload-image")
+async def upload_image(
+    file: UploadFile = File(...),
+    login: Optional[str] = Form(None),
+    current: Optional[auth_tokens.CurrentUser] = Depends(auth_tokens.get_optional_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Пользователь — из токена (login — для старых клиентов)
+    user_id = await db.run_sync(lambda session: auth_tokens.resolve_user_id(session, current, login))
+
+    filename, content_hash = await save_upload_file(file)
+    file_url = upload_file_url(filename)
+
+    upload = Upload(
+        filename=filename,
+        file_url=file_url,
+        content_hash=content_hash,
+        user_id=user_id,
+        uploaded_at=datetime.utcnow(),
+        recognized_text=None
+    )
+    db.add(upload)
+    await db.commit()
+    return {"upload_id": upload.id, "file_url": file_url}
+
+@router.post("/scan", status_code=202)
+def scan_image(upload_id: int = Form(...), db: Session = Depends(get_db)):
+    upload = db.query(Upload).filter_by(id=upload_id).first()
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+
+    # ♻️ Такое же изображение уже распознавали — отдаём готовый текст без OCR и без списания
+    # (сначала кэш результатов OCR, затем готовые записи в БД)
+    cached_text = (
+        upload.recognized_text
+        or ocr_cache.lookup(upload.content_hash)
+        or upload_crud.get_cached_recognized_text(db, upload.content_hash)
+    )
+    if cached_text is not None:
+        upload.recognized_text = cached_text
+        job = ocr_jobs.create_job(db, upload, None, recognized_text=cached_text)
+        stats.scans_recorded(db, [upload.id])
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "recognized_text": cached_text,
+            **(subscription_status.get_status(db, upload.user_id) or subscription_status.NO_SUBSCRIPTION)
+        }
+
+    # 💳 Атомарное списание лимита (скан возвращается, если задача завершится ошибкой)
+    reservation = quota.reserve(db, upload.user_id, 1, commit=False)
+    if reservation is None:
+        raise HTTPException(status_code=403, detail="Лимит сканирований исчерпан")
+
+    # 📝 Ставим задачу в очередь — распознавание выполнят воркеры (списание коммитится вместе с задачей)
+    job = ocr_jobs.create_job(db, upload, reservation.user_subscription_id)
+    quota.commit(reservation)
+    ocr_jobs.submit(job.id)
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "subscription_type": db.get(Subscription, reservation.subscription_id).name,
+        "remaining_scans": reservation.remaining
+    }
+
+# 📚 Пакетное сканирование: проверка страниц, готовый текст из кэша,
+# одно атомарное списание лимита на все страницы, которые нужно распознать (работа с БД — в threadpool)
+def _reserve_batch(
+    upload_ids: Optional[List[int]],
+    saved: list[tuple[str, str]],
+    login: Optional[str],
+    current: auth_tokens.CurrentUser
+) -> tuple[int, Optional[quota.Reservation], list[tuple]]:
+    db = SessionLocal()
+    try:
+        if saved:
+            # Новые файлы: создаём записи Upload (коммит — вместе со списанием); login — только для администратора
+            user_id = auth_tokens.resolve_token_user_id(db, current, login)
+            pages = []
+            for filename, content_hash in saved:
+                upload = Upload(
+                    filename=filename,
+                    file_url=upload_file_url(filename),
+                    content_hash=content_hash,
+                    user_id=user_id,
+                    uploaded_at=datetime.utcnow(),
+                    recognized_text=None
+                )
+                db.add(upload)
+                pages.append(upload)
+        else:
+            # Уже загруженные файлы: один запрос на все страницы, порядок — как в upload_ids
+            found = {u.id: u for u in db.query(Upload).filter(Upload.id.in_(upload_ids)).all()}
+            missing = [i for i in upload_ids if i not in found]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Upload not found: {missing}")
+            pages = [found[i] for i in upload_ids]
+
+            owners = {u.user_id for u in pages}
+            if len(owners) != 1:
+                raise HTTPException(status_code=400, detail="Все страницы должны принадлежать одному пользователю")
+            user_id = owners.pop()
+            # Чужие загрузки — только администратору
+            if not current.is_admin and (current.kind != "user" or user_id != current.id):
+                raise HTTPException(status_code=403, detail="Нет доступа")
+
+        # ♻️ Страницы, которые уже распознавались (сами или их копии), не сканируем повторно
+        cached = {}
+        for upload in pages:
+            text = (
+                upload.recognized_text
+                or ocr_cache.lookup(upload.content_hash)
+                or upload_crud.get_cached_recognized_text(db, upload.content_hash)
+            )
+            if text is not None:
+                upload.recognized_text = text
+                cached[id(upload)] = text
+        to_scan = [u for u in pages if id(u) not in cached]
+
+        # 💳 Одно атомарное списание лимита на весь пакет (коммит — вместе с новыми Upload)
+        reservation = None
+        if to_scan:
+            reservation = quota.reserve(db, user_id, len(to_scan), commit=False)
+            if reservation is None:
+                db.rollback()
+                raise HTTPException(status_code=403, detail="Лимит сканирований исчерпан")
+        db.flush()
+        page_refs = [(u.id, u.filename, u.content_hash, cached.get(id(u))) for u in pages]
+        db.commit()
+        stats.scans_recorded(db, [upload_id for upload_id, *_, cached_text in page_refs if cached_text is not None])
+        return user_id, reservation, page_refs
+    finally:
+        db.close()
+
+
+async def _prepare_batch(
+    upload_ids: Optional[List[int]],
+    files: Optional[List[UploadFile]],
+    login: Optional[str],
+    current: auth_tokens.CurrentUser
+) -> tuple[int, Optional[quota.Reservation], list[tuple]]:
+    if bool(upload_ids) == bool(files):
+        raise HTTPException(status_code=400, detail="Передайте либо upload_ids, либо files")
+
+    page_count = len(upload_ids or files)
+    if page_count > SCAN_BATCH_MAX_PAGES:
+        raise HTTPException(status_code=400, detail=f"Не больше {SCAN_BATCH_MAX_PAGES} страниц за раз")
+
+    # Файлы запроса, не прошедшего проверки, из хранилища не удаляются: тот же файл (одинаковое содержимое)
+    # может в этот момент использовать параллельный запрос, ещё не записавший свою Upload.
+    # Такие файлы безвредны — при повторной загрузке того же изображения используются снова.
+    saved = []
+    for file in files or []:
+        saved.append(await save_upload_file(file))
+    return await run_in_threadpool(_reserve_batch, upload_ids, saved, login, current)
+
+
+# 💾 Итог пакета: тексты распознанных страниц, подтверждение использованных сканирований и возврат неудачных
+def _finish_batch(user_id: int, reservation: Optional[quota.Reservation], page_refs: list[tuple], texts: list) -> dict:
+    db = SessionLocal()
+    try:
+        results = []
+        failed = 0
+        for index, ((upload_id, _, _, cached_text), text) in enumerate(zip(page_refs, texts), start=1):
+            if isinstance(text, Exception):
+                print(f"❌ Ошибка OCR для upload_id={upload_id}:", text)
+                failed += 1
+                results.append({"page": index, "upload_id": upload_id, "recognized_text": None, "error": "OCR недоступен"})
+                continue
+
+            if cached_text is None:
+                db.query(Upload).filter_by(id=upload_id).update({"recognized_text": text}, synchronize_session=False)
+            results.append({"page": index, "upload_id": upload_id, "recognized_text": text, "error": None})
+
+        # Неудачные страницы не списываются
+        if reservation is not None:
+            quota.commit(reservation, reservation.count - failed)
+            quota.refund(db, reservation, commit=False)
+        db.commit()
+        stats.scans_recorded(db, [r["upload_id"] for r in results if r["error"] is None])
+
+        return {
+            "results": results,
+            **(subscription_status.get_status(db, user_id) or subscription_status.NO_SUBSCRIPTION)
+        }
+    finally:
+        db.close()
+
+
+async def _recognize_page(filename: str, content_hash: str | None, cached_text: str | None) -> str:
+    if cached_text is not None:
+        return cached_text
+    image_bytes = await run_in_threadpool(read_upload_bytes, filename)
+    return await extract_text(image_bytes, content_hash, check_cache=False)
+
+
+# 📚 Пакетное сканирование многостраничного документа (по токену; login и чужие upload_ids — для администратора)
+@router.post("/scan-batch")
+async def scan_batch(
+    upload_ids: Optional[List[int]] = Form(None),
+    files: Optional[List[UploadFile]] = File(None),
+    login: Optional[str] = Form(None),
+    current: auth_tokens.CurrentUser = Depends(auth_tokens.get_current_user)
+):
+    user_id, reservation, page_refs = await _prepare_batch(upload_ids, files, login, current)
+
+    # 🚀 Распознаём страницы параллельно
+    texts = await asyncio.gather(*(_recognize_page(f, h, t) for _, f, h, t in page_refs), return_exceptions=True)
+
+    return await run_in_threadpool(_finish_batch, user_id, reservation, page_refs, texts)
+
+# 📡 Событие Server-Sent Events
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+# 💾 Шаги потока, работающие с БД, — в threadpool, каждый со своей короткой сессией
+def _stream_status(user_id: int) -> dict:
+    db = SessionLocal()
+    try:
+        return subscription_status.get_status(db, user_id) or subscription_status.NO_SUBSCRIPTION
+    finally:
+        db.close()
+
+
+def _stream_save_page(upload_id: int, text: str, reservation: Optional[quota.Reservation]):
+    db = SessionLocal()
+    try:
+        db.query(Upload).filter_by(id=upload_id).update({"recognized_text": text}, synchronize_session=False)
+        if reservation is not None:
+            quota.commit(reservation, 1)
+        db.commit()
+        stats.scans_recorded(db, [upload_id])
+    finally:
+        db.close()
+
+
+def _stream_refund(reservation: quota.Reservation, count: int | None = None):
+    db = SessionLocal()
+    try:
+        quota.refund(db, reservation, count)
+    finally:
+        db.close()
+
+
+async def _stream_batch(user_id: int, reservation: Optional[quota.Reservation], page_refs: list[tuple]):
+    tasks = {
+        asyncio.create_task(_recognize_page(filename, content_hash, cached_text)): (index, upload_id, cached_text)
+        for index, (upload_id, filename, content_hash, cached_text) in enumerate(page_refs, start=1)
+    }
+    pending = set(tasks)
+    finished = 0
+    failed = 0
+    try:
+        status = await run_in_threadpool(_stream_status, user_id)
+        remaining = reservation.remaining if reservation is not None else status["remaining_scans"]
+        yield _sse("start", {
+            "pages": len(page_refs),
+            "to_scan": sum(cached_text is None for *_, cached_text in page_refs),
+            "subscription_type": status["subscription_type"],
+            "remaining_scans": remaining
+        })
+
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=SCAN_STREAM_PING_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Комментарий-пинг: прокси не закрывают соединение, пока OCR долго думает
+                yield ": ping\n\n"
+                continue
+
+            for task in done:
+                index, upload_id, cached_text = tasks[task]
+                error = task.exception()
+                if error is not None:
+                    print(f"❌ Ошибка OCR для upload_id={upload_id}:", error)
+                    failed += 1
+                    # Неудачная страница не списывается — остаток сразу растёт
+                    if reservation is not None:
+                        await run_in_threadpool(_stream_refund, reservation, 1)
+                    page = {"page": index, "upload_id": upload_id, "recognized_text": None, "error": "OCR недоступен"}
+                else:
+                    text = task.result()
+                    if cached_text is None:
+                        # Сохраняем сразу: при обрыве соединения готовые страницы не теряются
+                        await run_in_threadpool(_stream_save_page, upload_id, text, reservation)
+                    page = {"page": index, "upload_id": upload_id, "recognized_text": text, "error": None}
+                finished += 1
+                if reservation is not None:
+                    remaining = reservation.remaining
+                yield _sse("page", {**page, "done": finished, "total": len(tasks), "remaining_scans": remaining})
+
+        yield _sse("done", {
+            "pages": len(tasks),
+            "failed": failed,
+            **(await run_in_threadpool(_stream_status, user_id))
+        })
+    finally:
+        # Клиент отключился: нераспознанные страницы отменяем и возвращаем в лимит
+        for task in pending:
+            task.cancel()
+        if reservation is not None and reservation.settled < reservation.count:
+            # Отмена при обрыве соединения не должна прервать сам возврат
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(_stream_refund, reservation)
+
+
+# 📡 Пакетное сканирование с потоковой выдачей (text/event-stream): страницы приходят по мере распознавания.
+# События: start (страниц, к распознаванию, остаток лимита), page (текст страницы + актуальный remaining_scans),
+# done (итог и статус подписки). Параметры — как у /scan-batch; POST, поэтому на клиенте fetch + чтение потока.
+@router.post("/scan-batch/stream")
+async def scan_batch_stream(
+    upload_ids: Optional[List[int]] = Form(None),
+    files: Optional[List[UploadFile]] = File(None),
+    login: Optional[str] = Form(None),
+    current: auth_tokens.CurrentUser = Depends(auth_tokens.get_current_user)
+):
+    # Ошибки проверки и лимита — обычным HTTP-ответом, до начала потока
+    user_id, reservation, page_refs = await _prepare_batch(upload_ids, files, login, current)
+    return StreamingResponse(
+        _stream_batch(user_id, reservation, page_refs),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Статус задачи — только её владельцу (по токену; login — старые клиенты, если AUTH_ALLOW_LOGIN_PARAM) и администратору.
+# На чужую задачу — 404, как на несуществующую
+@router.get("/jobs/{job_id}", response_model=OcrJobOut)
+def get_scan_job(
+    job_id: int,
+    login: Optional[str] = None,
+    current: Optional[auth_tokens.CurrentUser] = Depends(auth_tokens.get_optional_user),
+    db: Session = Depends(get_db)
+):
+    job = db.query(OcrJob).filter_by(id=job_id).first()
+    if not (current is not None and current.is_admin):
+        user_id = auth_tokens.resolve_user_id(db, current, login)
+        if job is not None and job.user_id != user_id:
+            job = None
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    return OcrJobOut(
+        job_id=job.id,
+        upload_id=job.upload_id,
+        status=job.status,
+        recognized_text=job.recognized_text,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at
+    )
+
+
+
+# ?fields= без recognized_text — лёгкий список истории без текстов
+@router.get("/uploads/by-user", response_model=list[UploadOut], response_model_exclude_unset=True)
+def get_uploads_by_user(
+    response: Response,
+    login: Optional[str] = None,
+    current: Optional[auth_tokens.CurrentUser] = Depends(auth_tokens.get_optional_user),
+    page: PageParams = Depends(),
+    db: Session = Depends(get_read_db)
+):
+    user_id = auth_tokens.resolve_user_id(db, current, login)
+    query = db.query(Upload).filter_by(user_id=user_id)
+    return paginate(query, page, response, (Upload.uploaded_at, Upload.id), UploadOut)
+
+
+# 🔎 Поиск по распознанному тексту своих загрузок (только по токену): ?q=чек молоко (релевантные сверху)
+@router.get("/search", response_model=list[UploadSearchHit])
+def search_uploads(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    login: Optional[str] = Query(None, description="Чужие загрузки — только для администратора"),
+    current: auth_tokens.CurrentUser = Depends(auth_tokens.get_current_user),
+    page: PageParams = Depends(),
+    db: Session = Depends(get_read_db)
+):
+    user_id = auth_tokens.resolve_token_user_id(db, current, login)
+    return search.search_uploads(db, user_id, q, page, response)
+
+
+# 📊 OCR: кэш результатов (попадания по уровням, вытеснения), автоматы отключения и задержки внешнего сервиса
+@router.get("/ocr/stats")
+def get_ocr_stats():
+    return {"cache": ocr_cache.stats(), "remote": ocr_client.stats()}
+
+
+# 🔗 Оригинал файла: редирект на хранилище (подписанная ссылка S3 или /uploads/...) — байты идут мимо API
+@router.get("/files/{filename}")
+def get_file(filename: str):
+    if os.path.basename(filename) != filename or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    files = storage.get_storage()
+    if isinstance(files, storage.LocalStorage) and not files.exists(filename):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    return RedirectResponse(files.download_url(filename), status_code=302)
+
+
+# 🖼 Превью загрузки: thumb (история) или medium (просмотр). Содержимое по URL не меняется —
+# браузер и CDN кэшируют его на год, повторная проверка по ETag отвечает 304 без чтения файла
+@router.get("/files/{filename}/{variant}")
+def get_file_derivative(filename: str, variant: str, request: Request):
+    tag = thumbnails.etag(filename, variant)
+    headers = {"ETag": tag, "Cache-Control": thumbnails.CACHE_CONTROL}
+    if thumbnails.etag_matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers=headers)
+
+    path = thumbnails.get_derivative(filename, variant)
+    return FileResponse(path, media_type=thumbnails.MEDIA_TYPE, headers=headers)
@@ -1,257 +1,302 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-
-from sqlalchemy.orm import Session
-from typing import List
-
-from crud import user_crud
-from schemas.user_schemas import UserLogin, UserOut, UserCreate
-from db.database import SessionLocal
-from db.database import get_db
-from utils.security import verify_password, hash_password
-from models.user_models import User
-from schemas.user_schemas import PasswordChange
-import uuid
-from datetime import datetime, timedelta
-import requests
-
-from models.upload_models import Upload
-from models.subscription_models import UserSubscription
-from models.subscription_models import Subscription
-
-from schemas.subscription_schemas import SubscriptionStatus
-from schemas.subscription_schemas import UpdateSubscriptionRequest
-
-
-router = APIRouter()
-
-# 🔌 Подключение к БД
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# 🔐 Вход пользователя
-@router.post("/login", response_model=UserOut)
-def login_user(user: UserLogin, db: Session = Depends(get_db)):
-    try:
-        db_user = user_crud.get_user_by_login(db, user.login)
-        if not db_user or not verify_password(user.password, db_user.password_hash):
-            raise HTTPException(status_code=401, detail="Неверный логин или пароль")
-
-        user_sub = (
-            db.query(UserSubscription)
-            .join(Subscription)
-            .filter(UserSubscription.user_id == db_user.id, UserSubscription.is_active == True)
-            .first()
-        )
-
-        return UserOut(
-            id=db_user.id,
-            login=db_user.login,
-            email=db_user.email,
-            role=db_user.role,
-            is_blocked=db_user.is_blocked,
-            subscription_type=user_sub.subscription.name if user_sub else "none",
-            remaining_scans=user_sub.remaining_scans if user_sub else 0
-        )
-
-    except Exception as e:
-        print("❌ Ошибка при входе:", e)
-        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
-
-
-@router.post("/change-password")
-def change_password(data: PasswordChange, db: Session = Depends(get_db)):
-    # Получаем пользователя по логину
-    user = user_crud.get_user_by_login(db, data.login)
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
-
-    # Проверяем старый пароль
-    if not verify_password(data.old_password, user.password_hash):
-        raise HTTPException(status_code=400, detail="Неверный текущий пароль")
-
-    # Обновляем пароль
-    user.password_hash = hash_password(data.new_password)
-    db.commit()
-
-    return {"message": "Пароль успешно обновлён"}
-
-@router.post("/register", response_model=UserOut)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    # Логирование для проверки входных данных
-    print(f"Регистрация нового пользователя: {user.login}, {user.email}")
-
-    # Проверка на уникальность логина
-    if user_crud.get_user_by_login(db, user.login):
-        print(f"Ошибка: Логин {user.login} уже используется.")
-        raise HTTPException(status_code=400, detail="Логин уже используется")
-
-    return user_crud.create_user(db, user)
-
-# 📋 Получить всех пользователей (используется в React)
-# @router.get("/", response_model=List[UserOut])
-# def get_users(db: Session = Depends(get_db)):
-#     return db.query(User).all()
-
-@router.get("/", response_model=List[UserOut])
-def get_users(db: Session = Depends(get_db)):
-    users = db.query(User).all()
-    result = []
-    for user in users:
-        active_sub = (
-            db.query(UserSubscription)
-            .filter_by(user_id=user.id, is_active=True)
-            .join(Subscription)
-            .first()
-        )
-        user.subscription_status = active_sub.subscription.name if active_sub else "free"
-        result.append(user)
-    return result
-
-
-@router.delete("/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    success = user_crud.delete_user_by_id(db, user_id)
-    if not success:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
-    return {"message": f"Пользователь с ID {user_id} удалён"}
-
-@router.get("/{user_id}", response_model=UserOut)
-def get_user_by_id(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
-    return user
-
-@router.post("/upload-image")
-async def upload_image(file: UploadFile = File(...), login: str = Form(...), db: Session = Depends(get_db)):
-    # Находим пользователя
-    user = db.query(User).filter_by(login=login).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Сохраняем файл на диск
-    filename = f"{uuid.uuid4().hex}_{file.filename}"
-    file_path = f"uploads/{filename}"
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
-
-    # Создаём запись в Upload
-    upload = Upload(
-        filename=filename,
-        file_url=f"http://localhost:8000/uploads/{filename}",
-        user_id=user.id,
-        recognized_text=None,
-        uploaded_at=datetime.utcnow()
-    )
-    db.add(upload)
-    db.commit()
-    db.refresh(upload)
-    return {"upload_id": upload.id}
-
-@router.post("/scan-image")
-def scan_image(upload_id: int, db: Session = Depends(get_db)):
-    upload = db.query(Upload).filter_by(id=upload_id).first()
-    if not upload:
-        raise HTTPException(status_code=404, detail="Upload not found")
-
-    # Открываем файл
-    with open(f"uploads/{upload.filename}", "rb") as f:
-        image_bytes = f.read()
-
-    # Отправляем в внешний OCR
-    #response = requests.post("https://fastapitext.fly.dev/extract-text/", files={"image": ("file.jpg", image_bytes)})
-    response = requests.post("https://fastapitext-black-feather-5039.fly.dev/extract-text/", files={"file": ("file.jpg", image_bytes)})
-    print("📩 Ответ от сервера:", response.json())
-    print("📦 Ответ:", response.text)
-    print(response.headers)
-
-    text = response.json().get("text", "")
-
-    # Обновляем запись
-    upload.recognized_text = text
-    db.commit()
-
-    return {"recognized_text": text}
-
-@router.get("/user/{user_id}/subscription", response_model=SubscriptionStatus)
-def get_user_subscription(user_id: int, db: Session = Depends(get_db)):
-    user_sub = db.query(UserSubscription).filter_by(user_id=user_id, is_active=True).first()
-    if not user_sub:
-        raise HTTPException(status_code=404, detail="Активная подписка не найдена")
-    return {
-        "subscription_type": user_sub.subscription.name,
-        "remaining_scans": user_sub.remaining_scans
-    }
-
-@router.get("/subscription-status")
-def subscription_status(login: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter_by(login=login).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
-
-    active_sub = (
-    db.query(UserSubscription)
-    .join(User)
-    .join(Subscription)
-    .filter(User.login == login, UserSubscription.is_active == True)
-    .first()
-    )
-    if not active_sub:
-        return {"subscription_type": "none", "remaining_scans": 0}
-
-    return {
-        "subscription_type": active_sub.subscription.name,
-        "remaining_scans": active_sub.remaining_scans
-    }
-
-@router.get("/user_info/{login}", response_model=UserOut)
-def get_user_info(login: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter_by(login=login).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
-
-    user_sub = (
-        db.query(UserSubscription)
-        .join(Subscription)
-        .filter(UserSubscription.user_id == user.id, UserSubscription.is_active == True)
-        .first()
-    )
-
-    return UserOut(
-        id=user.id,
-        login=user.login,
-        email=user.email,
-        role=user.role,
-        is_blocked=user.is_blocked,
-        subscription_type=user_sub.subscription.name if user_sub else "none",
-        remaining_scans=user_sub.remaining_scans if user_sub else 0
-    )
-
-@router.post("/update-subscription")
-def update_user_subscription(data: UpdateSubscriptionRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter_by(login=data.login).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
-
-    new_sub = db.query(Subscription).filter_by(name=data.new_status).first()
-    if not new_sub:
-        raise HTTPException(status_code=404, detail="Подписка не найдена")
-
-    db.query(UserSubscription).filter_by(user_id=user.id, is_active=True).update({"is_active": False})
-
-    new_user_sub = UserSubscription(
-        user_id=user.id,
-        subscription_id=new_sub.id,
-        start_date=datetime.utcnow(),
-        end_date=datetime.utcnow() + timedelta(days=new_sub.duration_days),
-        remaining_scans=new_sub.scan_limit,
-        is_active=True
-    )
-    db.add(new_user_sub)
-    db.commit()
-
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Response
+
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import os
+
+from crud import user_crud, upload_crud, subscription_crud
+from schemas.user_schemas import UserLogin, UserOut, UserCreate
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.database import get_db, get_read_db, get_async_db
+from utils.security import hash_password_async, verify_password_async, verify_and_update_async
+from models.user_models import User
+from schemas.user_schemas import PasswordChange, UserLoginOut, TokenPair, RefreshRequest, LogoutRequest
+from fastapi.security import HTTPAuthorizationCredentials
+import uuid
+from datetime import datetime, timedelta
+from starlette.concurrency import run_in_threadpool
+
+from models.upload_models import Upload
+from models.subscription_models import UserSubscription
+from models.subscription_models import Subscription
+
+from schemas.subscription_schemas import ActiveSubscriptionOut
+from schemas.subscription_schemas import UpdateSubscriptionRequest
+from utils.ocr_client import OCRError, OCRUnavailable
+from utils.ocr_service import extract_text
+from utils.uploads import read_upload_bytes, save_upload_file, upload_file_url
+from utils import ocr_cache, stats, subscription_status
+from utils import auth as auth_tokens
+
+
+router = APIRouter()
+
+# Размер страницы списка пользователей
+USERS_PAGE_DEFAULT = int(os.getenv("USERS_PAGE_DEFAULT", "100"))
+USERS_PAGE_MAX = int(os.getenv("USERS_PAGE_MAX", "500"))
+
+# 🔐 Вход пользователя (async: ожидание bcrypt не занимает поток threadpool, запросы к БД — через AsyncSession)
+@router.post("/login", response_model=UserLoginOut)
+async def login_user(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    try:
+        auth = await db.run_sync(lambda session: user_crud.get_user_auth(session, user.login))
+        if not auth:
+            raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+        await db.rollback()  # отпускаем соединение в пул на время bcrypt
+
+        # bcrypt — в отдельном пуле процессов; устаревший хеш заодно пересчитываем
+        valid, new_hash = await verify_and_update_async(user.password, auth.password_hash)
+        if not valid:
+            raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+        if new_hash:
+            await db.run_sync(lambda session: user_crud.set_password_hash(session, auth.id, new_hash))
+        if auth.is_blocked:
+            raise HTTPException(status_code=403, detail="Пользователь заблокирован")
+
+        db_user = await db.run_sync(lambda session: user_crud.get_user_profile(session, user_id=auth.id))
+        return UserLoginOut(
+            id=db_user.id,
+            login=db_user.login,
+            email=db_user.email,
+            role=db_user.role,
+            is_blocked=db_user.is_blocked,
+            subscription_type=db_user.subscription_type,
+            remaining_scans=db_user.remaining_scans,
+            # 🔑 Дальше клиент ходит с заголовком Authorization: Bearer <access_token>
+            **auth_tokens.issue_tokens("user", db_user.id, db_user.login, db_user.role)
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("❌ Ошибка при входе:", e)
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+# 🔁 Новая пара токенов по refresh-токену (старый refresh-токен отзывается)
+@router.post("/refresh", response_model=TokenPair)
+def refresh_tokens(data: RefreshRequest, db: Session = Depends(get_db)):
+    claims = auth_tokens.use_refresh_token(db, data.refresh_token, "user")
+    user = user_crud.get_user_auth(db, claims["login"])
+    if not user or user.id != claims["sub"] or user.is_blocked:
+        raise HTTPException(status_code=401, detail="Пользователь недоступен")
+    return auth_tokens.issue_tokens("user", claims["sub"], claims["login"], claims.get("role"))
+
+# 🚪 Выход: отзываем access- и (если передан) refresh-токен
+@router.post("/logout")
+def logout_user(
+    data: Optional[LogoutRequest] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(auth_tokens.bearer),
+    current: auth_tokens.CurrentUser = Depends(auth_tokens.get_current_user),
+    db: Session = Depends(get_db)
+):
+    auth_tokens.logout(db, current, credentials.credentials, data.refresh_token if data else None)
+    return {"message": "Вы вышли из системы"}
+
+# 👤 Текущий пользователь по токену
+@router.get("/me", response_model=UserOut)
+def get_me(current: auth_tokens.CurrentUser = Depends(auth_tokens.get_current_user), db: Session = Depends(get_db)):
+    user = user_crud.get_user_profile(db, user_id=auth_tokens.resolve_user_id(db, current))
+    if not user:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    return user
+
+
+@router.post("/change-password")
+async def change_password(data: PasswordChange, db: AsyncSession = Depends(get_async_db)):
+    # Получаем пользователя по логину
+    auth = await db.run_sync(lambda session: user_crud.get_user_auth(session, data.login))
+    if not auth:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    await db.rollback()  # отпускаем соединение в пул на время bcrypt
+
+    # Проверяем старый пароль
+    if not await verify_password_async(data.old_password, auth.password_hash):
+        raise HTTPException(status_code=400, detail="Неверный текущий пароль")
+
+    # Обновляем пароль
+    password_hash = await hash_password_async(data.new_password)
+    await db.run_sync(lambda session: user_crud.set_password_hash(session, auth.id, password_hash))
+
+    return {"message": "Пароль успешно обновлён"}
+
+@router.post("/register", response_model=UserOut)
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    # Логирование для проверки входных данных
+    print(f"Регистрация нового пользователя: {user.login}, {user.email}")
+
+    # Проверка на уникальность логина
+    if await db.run_sync(lambda session: user_crud.login_exists(session, user.login)):
+        print(f"Ошибка: Логин {user.login} уже используется.")
+        raise HTTPException(status_code=400, detail="Логин уже используется")
+    await db.rollback()  # отпускаем соединение в пул на время bcrypt
+
+    password_hash = await hash_password_async(user.password)
+    return await db.run_sync(lambda session: user_crud.create_user(session, user, password_hash=password_hash))
+
+# 📋 Получить всех пользователей (используется в React)
+# @router.get("/", response_model=List[UserOut])
+# def get_users(db: Session = Depends(get_db)):
+#     return db.query(User).all()
+
+@router.get("/", response_model=List[UserOut])
+def get_users(
+    response: Response,
+    cursor: Optional[int] = Query(None, description="id последнего пользователя предыдущей страницы"),
+    limit: int = Query(USERS_PAGE_DEFAULT, ge=1, le=USERS_PAGE_MAX),
+    role: Optional[str] = None,
+    is_blocked: Optional[bool] = None,
+    plan: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    rows = user_crud.get_users_with_active_plan(
+        db, after_id=cursor, limit=limit + 1, role=role, is_blocked=is_blocked, plan=plan
+    )
+
+    result = [
+        UserOut(
+            id=row.id,
+            login=row.login,
+            email=row.email,
+            role=row.role,
+            is_blocked=row.is_blocked,
+            subscription_type=row.subscription_type or "free",
+            remaining_scans=row.remaining_scans or 0
+        )
+        for row in rows
+    ]
+
+    # Есть следующая страница — отдаём курсор в заголовке, тело остаётся списком
+    if len(result) > limit:
+        result = result[:limit]
+        response.headers["X-Next-Cursor"] = str(result[-1].id)
+    return result
+
+
+# {user_id:int} — иначе маршрут перехватывает /subscription-status и другие пути из одного сегмента
+@router.delete("/{user_id:int}")
+def delete_user(user_id: int, db: Session = Depends(get_db)):
+    success = user_crud.delete_user_by_id(db, user_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    subscription_status.forget_user(user_id)
+    return {"message": f"Пользователь с ID {user_id} удалён"}
+
+@router.get("/{user_id:int}", response_model=UserOut)
+def get_user_by_id(user_id: int, db: Session = Depends(get_db)):
+    user = user_crud.get_user_profile(db, user_id=user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    return user
+
+@router.post("/upload-image")
+async def upload_image(
+    file: UploadFile = File(...),
+    login: Optional[str] = Form(None),
+    current: Optional[auth_tokens.CurrentUser] = Depends(auth_tokens.get_optional_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Пользователь — из токена (login — для старых клиентов)
+    user_id = await db.run_sync(lambda session: auth_tokens.resolve_user_id(session, current, login))
+
+    # Сохраняем файл на диск
+    filename, content_hash = await save_upload_file(file)
+
+    # Создаём запись в Upload
+    upload = Upload(
+        filename=filename,
+        file_url=upload_file_url(filename),
+        content_hash=content_hash,
+        user_id=user_id,
+        recognized_text=None,
+        uploaded_at=datetime.utcnow()
+    )
+    db.add(upload)
+    await db.commit()
+    return {"upload_id": upload.id}
+
+@router.post("/scan-image")
+async def scan_image(upload_id: int, db: AsyncSession = Depends(get_async_db)):
+    upload = await db.get(Upload, upload_id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+    # ♻️ Такое же изображение уже распознавали — OCR не нужен (кэш результатов OCR, затем записи в БД)
+    cached_text = (
+        await run_in_threadpool(ocr_cache.lookup, upload.content_hash)
+        or await db.run_sync(lambda session: upload_crud.get_cached_recognized_text(session, upload.content_hash))
+    )
+    if cached_text is not None:
+        upload.recognized_text = cached_text
+        await db.commit()
+        await db.run_sync(lambda session: stats.scans_recorded(session, [upload_id]))
+        return {"recognized_text": cached_text}
+
+    # Закрываем транзакцию чтения — соединение не держим, пока ждём OCR
+    await db.commit()
+
+    # Открываем файл
+    image_bytes = await run_in_threadpool(read_upload_bytes, upload.filename)
+
+    # Отправляем в внешний OCR
+    try:
+        text = await extract_text(image_bytes, upload.content_hash, check_cache=False)
+    except OCRUnavailable as e:
+        # Автомат отключения открыт — отвечаем сразу, не дожидаясь таймаутов
+        print("⚡️ OCR отключён:", e)
+        raise HTTPException(status_code=503, detail="Сервис распознавания временно недоступен, повторите позже")
+    except OCRError as e:
+        print("❌ Ошибка OCR:", e)
+        raise HTTPException(status_code=502, detail="Сервис распознавания недоступен")
+
+    # Обновляем запись
+    upload.recognized_text = text
+    await db.commit()
+    await db.run_sync(lambda session: stats.scans_recorded(session, [upload_id]))
+
+    return {"recognized_text": text}
+
+@router.get("/user/{user_id}/subscription", response_model=ActiveSubscriptionOut)
+def get_user_subscription(user_id: int, db: Session = Depends(get_db)):
+    status = subscription_status.get_status(db, user_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Активная подписка не найдена")
+    return status
+
+@router.get("/subscription-status")
+def subscription_status_by_login(
+    login: Optional[str] = None,
+    current: Optional[auth_tokens.CurrentUser] = Depends(auth_tokens.get_optional_user),
+    db: Session = Depends(get_db)
+):
+    user_id = auth_tokens.resolve_user_id(db, current, login)
+    return subscription_status.get_status(db, user_id) or subscription_status.NO_SUBSCRIPTION
+
+@router.get("/user_info/{login}", response_model=UserOut)
+def get_user_info(login: str, db: Session = Depends(get_db)):
+    user = user_crud.get_user_profile(db, login=login)
+    if not user:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+
+    return UserOut(
+        id=user.id,
+        login=user.login,
+        email=user.email,
+        role=user.role,
+        is_blocked=user.is_blocked,
+        subscription_type=user.subscription_type,
+        remaining_scans=user.remaining_scans
+    )
+
+@router.post("/update-subscription")
+def update_user_subscription(data: UpdateSubscriptionRequest, db: Session = Depends(get_db)):
+    user = db.query(User).filter_by(login=data.login).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+
+    new_sub = db.query(Subscription).filter_by(name=data.new_status).first()
+    if not new_sub:
+        raise HTTPException(status_code=404, detail="Подписка не найдена")
+
+    subscription_crud.replace_active_subscription(db, user.id, new_sub)
+
     return {"message": f"Подписка пользователя {data.login} обновлена до {data.new_status}"}
\ No newline at end of file
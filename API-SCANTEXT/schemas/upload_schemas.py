@@ -1,14 +1,45 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
-
-class UploadOut(BaseModel):
-    id: int
-    filename: str
-    file_url: str
-    recognized_text: Optional[str]
-    uploaded_at: datetime
-
-    class Config:
-        orm_mode = True
-        from_attributes = True
+from pydantic import BaseModel, computed_field
+from datetime import datetime
+from typing import Optional
+
+from utils import thumbnails
+
+class UploadOut(BaseModel):
+    id: int
+    filename: str
+    file_url: str
+    recognized_text: Optional[str] = None
+    uploaded_at: datetime
+
+    # 🖼 Превью для истории: плитки грузят миниатюру, а не оригинал
+    @computed_field
+    @property
+    def thumbnail_url(self) -> str:
+        return thumbnails.derivative_url(self.filename, "thumb")
+
+    @computed_field
+    @property
+    def medium_url(self) -> str:
+        return thumbnails.derivative_url(self.filename, "medium")
+
+    class Config:
+        orm_mode = True
+        from_attributes = True
+
+# 🔎 Результат поиска: snippet — фрагмент текста с подсветкой найденных слов
+class UploadSearchHit(BaseModel):
+    id: int
+    filename: str
+    file_url: str
+    uploaded_at: datetime
+    snippet: Optional[str] = None
+    score: float
+
+class OcrJobOut(BaseModel):
+    job_id: int
+    upload_id: int
+    status: str
+    recognized_text: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,11 @@
+# 🧪 Тесты: python -m pytest (из папки API-SCANTEXT)
+# Приложение работает на временной SQLite-базе — DATABASE_URL переопределяется до импорта приложения
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tests.db')}"
+os.environ.pop("REPLICA_DATABASE_URL", None)
+os.environ.setdefault("OCR_JOB_MODE", "external")
@@ -0,0 +1,10 @@
+# 🔢 Бюджет SQL-запросов на эндпоинт (tools/check_query_budget.py)
+from fastapi.testclient import TestClient
+
+from tools import check_query_budget
+
+
+def test_endpoints_within_query_budget():
+    user_id, login = check_query_budget.seed(60)
+    failures = check_query_budget.check(TestClient(check_query_budget.app), user_id, login)
+    assert failures == [], f"Превышен бюджет запросов: {', '.join(failures)}"
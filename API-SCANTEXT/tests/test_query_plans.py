@@ -0,0 +1,6 @@
+# 🔍 Горячие запросы идут по индексам (tools/check_query_plans.py)
+from tools import check_query_plans
+
+
+def test_hot_queries_use_indexes():
+    assert check_query_plans.main() == 0
@@ -0,0 +1,70 @@
+# ⏱ Пропускная способность записи SQLite при параллельных писателях: WAL против rollback-журнала
+# Пример: python -m tools.bench_db_wal --threads 8 --seconds 5
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from db.database import build_engine
+
+
+def run(wal: bool, threads: int, seconds: float, readers: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = build_engine(f"sqlite:///{path}", wal=wal)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE scans (id INTEGER PRIMARY KEY, user_id INTEGER, remaining INTEGER)"))
+        conn.execute(text("INSERT INTO scans (user_id, remaining) VALUES (1, 1000000)"))
+
+    stats = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    # Писатель: как списание сканирования — короткая транзакция UPDATE + INSERT
+    def writer(n):
+        while time.perf_counter() < deadline:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text("UPDATE scans SET remaining = remaining - 1 WHERE id = 1"))
+                    conn.execute(text("INSERT INTO scans (user_id, remaining) VALUES (:u, 0)"), {"u": n})
+                with lock:
+                    stats["writes"] += 1
+            except OperationalError:
+                with lock:
+                    stats["errors"] += 1
+
+    def reader():
+        while time.perf_counter() < deadline:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT remaining FROM scans WHERE id = 1")).scalar()
+                with lock:
+                    stats["reads"] += 1
+            except OperationalError:
+                with lock:
+                    stats["errors"] += 1
+
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    workers += [threading.Thread(target=reader) for _ in range(readers)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    engine.dispose()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    for wal in (False, True):
+        s = run(wal, args.threads, args.seconds, args.readers)
+        mode = "WAL    " if wal else "DELETE "
+        print(f"{mode} записей/с: {s['writes'] / args.seconds:8.0f}   чтений/с: {s['reads'] / args.seconds:8.0f}   ошибок: {s['errors']}")
@@ -0,0 +1,81 @@
+# ⏱ Пропускная способность /user/login и задержка «посторонних» запросов во время шторма логинов
+# Пример: BCRYPT_ROUNDS=12 python -m tools.bench_login --concurrency 64 --logins 200
+# Параллельных логинов — больше, чем потоков в threadpool AnyIO (40): иначе голодание синхронных обработчиков не видно
+# Работает на временной SQLite-базе (DATABASE_URL переопределяется до импорта приложения).
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ.setdefault("OCR_JOB_MODE", "external")
+
+import httpx
+
+from db.database import SessionLocal
+from main import app
+from models.subscription_models import Subscription
+from models.user_models import User
+from utils import security
+
+LOGIN = "bench"
+PASSWORD = "bench-password"
+
+
+def seed():
+    db = SessionLocal()
+    try:
+        db.add(Subscription(name="free", scan_limit=10, price=0, duration_days=30))
+        db.add(User(login=LOGIN, email="bench@example.com", password_hash=security.hash_password(PASSWORD)))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run(concurrency: int, logins: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        remaining = logins
+        pings = []
+
+        async def login_worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.post("/user/login", json={"login": LOGIN, "password": PASSWORD})
+                assert response.status_code == 200, response.text
+
+        async def ping_worker():
+            # Лёгкий эндпоинт: его задержка не должна расти из-за bcrypt
+            while remaining > 0:
+                started = time.perf_counter()
+                await client.get("/")
+                pings.append(time.perf_counter() - started)
+                await asyncio.sleep(0.05)
+
+        started = time.perf_counter()
+        await asyncio.gather(ping_worker(), *(login_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    pings.sort()
+    return {
+        "logins_per_sec": logins / elapsed,
+        "ping_p50_ms": statistics.median(pings) * 1000 if pings else 0.0,
+        "ping_p95_ms": pings[int(len(pings) * 0.95)] * 1000 if pings else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--logins", type=int, default=200)
+    args = parser.parse_args()
+
+    seed()
+    result = asyncio.run(run(args.concurrency, args.logins))
+    security.shutdown_pool()
+    print(f"bcrypt rounds={security.BCRYPT_ROUNDS}, воркеров={security.PASSWORD_HASH_WORKERS}")
+    print(f"логинов/с: {result['logins_per_sec']:.1f}   "
+          f"задержка GET /: p50 {result['ping_p50_ms']:.1f} мс, p95 {result['ping_p95_ms']:.1f} мс")
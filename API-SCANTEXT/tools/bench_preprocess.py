@@ -0,0 +1,69 @@
+# ⏱ Размер отправляемого в OCR файла и задержка распознавания до/после предобработки
+# Пример:
+#   OCR_STUB_MS_PER_MB=300 uvicorn tools.ocr_stub:app --port 9000 &
+#   OCR_URL=http://127.0.0.1:9000/extract-text/ python -m tools.bench_preprocess --images 20
+import argparse
+import asyncio
+import io
+import random
+import statistics
+import time
+
+from PIL import Image, ImageDraw
+
+from utils import image_preprocessing, ocr_client
+
+
+# 12-мегапиксельная «фотография документа» с текстом и шумом
+def make_photo(width: int = 4000, height: int = 3000, fmt: str = "PNG") -> bytes:
+    image = Image.new("RGB", (width, height), (235, 230, 220))
+    draw = ImageDraw.Draw(image)
+    rnd = random.Random(42)
+    for y in range(100, height - 100, 60):
+        x = 150
+        while x < width - 300:
+            w = rnd.randint(40, 220)
+            draw.rectangle([x, y, x + w, y + 30], fill=(rnd.randint(0, 60),) * 3)
+            x += w + rnd.randint(20, 40)
+    noise = Image.effect_noise((width, height), 25).convert("RGB")
+    image = Image.blend(image, noise, 0.15)
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+async def measure(payloads: list[tuple[bytes, str]]):
+    latencies = []
+    for data, filename in payloads:
+        started = time.perf_counter()
+        await ocr_client.recognize_text(data, filename)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run(count: int, fmt: str):
+    photo = make_photo(fmt=fmt)
+
+    started = time.perf_counter()
+    prepared = await asyncio.gather(*(image_preprocessing.prepare_for_ocr(photo) for _ in range(count)))
+    prep_time = time.perf_counter() - started
+
+    raw = await measure([(photo, "file.jpg")] * count)
+    processed = await measure(prepared)
+    await ocr_client.close_client()
+    image_preprocessing.shutdown_pool()
+
+    print(f"Настройки:         {image_preprocessing.settings_signature()}")
+    print(f"Исходник ({fmt}):   {len(photo) / 1024:.0f} КБ")
+    print(f"После обработки:   {len(prepared[0][0]) / 1024:.0f} КБ")
+    print(f"Предобработка:     {prep_time / count * 1000:.0f} мс/изобр. (пул {image_preprocessing.OCR_PREPROCESS_WORKERS} проц.)")
+    print(f"OCR без обработки: {statistics.median(raw) * 1000:.0f} мс (медиана)")
+    print(f"OCR с обработкой:  {statistics.median(processed) * 1000:.0f} мс (медиана)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=10)
+    parser.add_argument("--format", default="PNG", choices=["PNG", "JPEG"])
+    args = parser.parse_args()
+    asyncio.run(run(args.images, args.format))
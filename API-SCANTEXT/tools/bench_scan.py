@@ -0,0 +1,72 @@
+# ⏱ Замер задержки OCR-бэкенда (p50/p99) при N параллельных сканированиях
+# Пример (удалённый бэкенд против локальной заглушки):
+#   uvicorn tools.ocr_stub:app --port 9000 &
+#   OCR_URL=http://127.0.0.1:9000/extract-text/ python -m tools.bench_scan --concurrency 200
+# Хвост задержек и запасной сервис (hedging): медленная основная заглушка + быстрая запасная
+#   OCR_STUB_SLOW_RATE=0.05 OCR_STUB_SLOW_LATENCY=3 uvicorn tools.ocr_stub:app --port 9000 &
+#   uvicorn tools.ocr_stub:app --port 9001 &
+#   OCR_URL=http://127.0.0.1:9000/extract-text/ OCR_SECONDARY_URL=http://127.0.0.1:9001/extract-text/ \
+#   python -m tools.bench_scan --concurrency 20
+# Без сети (локальный бэкенд в пуле процессов):
+#   OCR_BACKEND=stub OCR_STUB_CPU_MS=50 python -m tools.bench_scan --concurrency 100
+import argparse
+import asyncio
+import statistics
+import time
+
+from utils import ocr_backends, ocr_client
+from utils.ocr_client import OCRError
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+async def run(concurrency: int, total: int, payload: bytes):
+    backend = ocr_backends.get_backend()
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                await backend.recognize(payload)
+                latencies.append(time.perf_counter() - started)
+            except OCRError:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await ocr_backends.close_backend()
+
+    print(f"Бэкенд:       {backend.name} ({backend.version})")
+    print(f"Запросов:     {total}, параллельно: {concurrency}, ошибок: {errors}")
+    print(f"Время:        {elapsed:.2f} c, {total / elapsed:.1f} скан/с")
+    if latencies:
+        print(f"p50:          {percentile(latencies, 50) * 1000:.1f} мс")
+        print(f"p99:          {percentile(latencies, 99) * 1000:.1f} мс")
+        print(f"mean:         {statistics.mean(latencies) * 1000:.1f} мс")
+    if backend.name == "remote":
+        remote = ocr_client.stats()
+        print(f"Hedging:      {remote['hedging']}")
+        for url, endpoint in remote["endpoints"].items():
+            print(f"{url}: автомат {endpoint['breaker']['state']}, отклонено {endpoint['breaker']['rejected']}, "
+                  f"исходы {endpoint['latency']['outcomes']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--total", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=200_000, help="размер изображения в байтах")
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.total, b"\xff" * args.size))
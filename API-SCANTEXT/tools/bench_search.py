@@ -0,0 +1,110 @@
+# ⏱ Поиск по распознанному тексту на синтетических OCR-документах: FTS5 против LIKE
+# Пример: python -m tools.bench_search --docs 1000000 --users 10000
+# Работает на временной SQLite-базе (DATABASE_URL переопределяется до импорта приложения).
+# Один «тяжёлый» пользователь получает --heavy-share всех документов — худший случай для фильтра по владельцу.
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ.setdefault("OCR_JOB_MODE", "external")
+
+from fastapi import Response
+from sqlalchemy import text
+
+from db.database import SessionLocal, engine
+from db.migrations import run_migrations
+from utils import search
+from utils.pagination import PageParams
+
+SYLLABLES = ["ка", "ро", "ми", "на", "то", "ле", "ва", "си", "ду", "пе", "ло", "за", "ri", "ta", "mo", "ne", "sa", "lu"]
+HEAVY_USER = 1
+
+
+def vocabulary(size: int, rng: random.Random) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def seed(docs: int, users: int, heavy_share: float, rng: random.Random) -> list[str]:
+    words = vocabulary(20000, rng)
+    # Частоты слов по Ципфу — как в настоящих текстах: немного частых слов, длинный хвост редких
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    batch = 20000
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (id, login, email, password_hash, role, is_blocked) "
+            "VALUES (:id, :login, :email, '-', 'user', 0)"
+        ), [{"id": i, "login": f"bench{i}", "email": f"bench{i}@example.com"} for i in range(1, users + 1)])
+
+    for offset in range(0, docs, batch):
+        rows = []
+        for i in range(offset, min(offset + batch, docs)):
+            user_id = HEAVY_USER if rng.random() < heavy_share else rng.randint(2, users)
+            body = " ".join(rng.choices(words, weights, k=rng.randint(20, 80)))
+            rows.append({"filename": f"{i}.jpg", "user_id": user_id, "text": body})
+        # Триггеры индекса срабатывают на каждой вставке — так же, как при записи из scan_image
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO uploads (filename, file_url, recognized_text, uploaded_at, user_id) "
+                "VALUES (:filename, '-', :text, CURRENT_TIMESTAMP, :user_id)"
+            ), rows)
+    print(f"вставка {docs} документов с индексацией: {time.perf_counter() - started:.1f} с")
+    return words
+
+
+def timed(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def run(words: list[str], users: int, repeats: int, rng: random.Random):
+    db = SessionLocal()
+    page = PageParams(cursor=None, limit=20, fields=None)
+    like_sql = text(
+        "SELECT id FROM uploads WHERE user_id = :user_id AND recognized_text LIKE :pattern "
+        "ORDER BY uploaded_at DESC LIMIT 20"
+    )
+    cases = [
+        ("частое слово", words[0]),
+        ("среднее слово", words[500]),
+        ("редкое слово", words[-1]),
+        ("два слова", f"{words[3]} {words[800]}"),
+        ("префикс", words[10][:4] + "*"),
+    ]
+    try:
+        for label, user_id in (("тяжёлый пользователь", HEAVY_USER), ("обычный пользователь", rng.randint(2, users))):
+            print(f"— {label} (user_id={user_id})")
+            for case, q in cases:
+                fts_ms = timed(lambda: search.search_uploads(db, user_id, q, page, Response()), repeats)
+                pattern = f"%{q.split()[0].rstrip('*')}%"
+                like_ms = timed(lambda: db.execute(like_sql, {"user_id": user_id, "pattern": pattern}).all(), repeats)
+                found = len(search.search_uploads(db, user_id, q, page, Response()))
+                print(f"  {case:14} q={q!r:24} FTS {fts_ms:8.2f} мс   LIKE {like_ms:8.2f} мс   найдено на странице: {found}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--heavy-share", type=float, default=0.1)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    run_migrations(engine)
+    words = seed(args.docs, args.users, args.heavy_share, rng)
+    run(words, args.users, args.repeats, rng)
@@ -0,0 +1,91 @@
+# ⏱ SQL-запросов на один запрос к «опрашиваемым» эндпоинтам статуса подписки: без кэша и с кэшем
+# Пример: python -m tools.bench_subscription_status --users 20 --rounds 20
+# Работает на временной SQLite-базе (DATABASE_URL переопределяется до импорта приложения).
+import argparse
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ.setdefault("OCR_JOB_MODE", "external")
+# Эндпоинты опрашиваются по ?login= без токена, как старые клиенты
+os.environ.setdefault("AUTH_ALLOW_LOGIN_PARAM", "1")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from db.database import SessionLocal, engine
+from main import app
+from models.subscription_models import Subscription
+from models.user_models import User
+from crud import subscription_crud
+from utils import subscription_status
+
+# Что фронтенд дёргает на каждой странице
+ENDPOINTS = [
+    "/user/subscription-status?login={login}",
+    "/subscriptions/subscription-info?login={login}",
+    "/user/user/{user_id}/subscription",
+    "/user/user_info/{login}",
+]
+
+statements = 0
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+
+
+def seed(users: int) -> list[tuple[int, str]]:
+    db = SessionLocal()
+    try:
+        free = db.query(Subscription).filter_by(name="free").first()
+        if not free:
+            free = Subscription(name="free", scan_limit=10, price=0, duration_days=30)
+            db.add(free)
+            db.commit()
+        created = []
+        for i in range(users):
+            # Хеш пароля не нужен — логин в бенчмарке не участвует
+            user = User(login=f"bench{i}", email=f"bench{i}@example.com", password_hash="-")
+            db.add(user)
+            db.commit()
+            subscription_crud.replace_active_subscription(db, user.id, free)
+            created.append((user.id, user.login))
+        return created
+    finally:
+        db.close()
+
+
+def run(client: TestClient, users: list, rounds: int, cached: bool) -> float:
+    global statements
+    ttl = subscription_status.SUBSCRIPTION_CACHE_TTL if cached else 0
+    for cache in (subscription_status.status_cache, subscription_status.login_cache):
+        cache.ttl = ttl
+        cache.clear()
+        cache.hits = cache.misses = 0
+
+    statements = 0
+    requests = 0
+    for _ in range(rounds):
+        for user_id, login in users:
+            for path in ENDPOINTS:
+                response = client.get(path.format(login=login, user_id=user_id))
+                assert response.status_code == 200, (path, response.status_code, response.text)
+                requests += 1
+    return statements / requests
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    users = seed(args.users)
+    client = TestClient(app)
+    for cached in (False, True):
+        per_request = run(client, users, args.rounds, cached)
+        print(f"{'с кэшем ' if cached else 'без кэша'}  SQL-запросов на запрос: {per_request:.2f}")
+    print("статистика кэша:", subscription_status.stats())
@@ -0,0 +1,87 @@
+# ⏱ Пропускная способность /upload/upload-image и задержка «посторонних» запросов во время потока загрузок
+# Пример: python -m tools.bench_upload --concurrency 32 --uploads 500
+# Работает на временной SQLite-базе (DATABASE_URL переопределяется до импорта приложения);
+# файлы пишутся во временную папку. Для сравнения «до/после» запустите скрипт на обеих ревизиях.
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.setdefault("OCR_JOB_MODE", "external")
+
+import httpx
+
+from db.database import SessionLocal
+from main import app
+from models.subscription_models import Subscription
+from models.user_models import User
+from utils import auth as auth_tokens
+from utils import storage
+
+LOGIN = "bench"
+
+
+def seed() -> int:
+    db = SessionLocal()
+    try:
+        db.add(Subscription(name="free", scan_limit=10, price=0, duration_days=30))
+        user = User(login=LOGIN, email="bench@example.com", password_hash="-")
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+async def run(concurrency: int, total: int, headers: dict) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        remaining = total
+        pings = []
+
+        async def upload_worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                # Разное содержимое — разные файлы (одинаковые дедуплицируются по sha256)
+                # Сигнатура JPEG: тип файла проверяется по содержимому
+                content = b"\xff\xd8\xff\xe0" + os.urandom(32 * 1024)
+                response = await client.post("/upload/upload-image", files={"file": ("page.jpg", content, "image/jpeg")})
+                assert response.status_code == 200, response.text
+
+        async def ping_worker():
+            # Лёгкий эндпоинт: его задержка показывает, блокируется ли event loop
+            while remaining > 0:
+                started = time.perf_counter()
+                await client.get("/")
+                pings.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        started = time.perf_counter()
+        await asyncio.gather(ping_worker(), *(upload_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    pings.sort()
+    return {
+        "uploads_per_sec": total / elapsed,
+        "ping_p50_ms": statistics.median(pings) * 1000 if pings else 0.0,
+        "ping_p95_ms": pings[int(len(pings) * 0.95)] * 1000 if pings else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--uploads", type=int, default=500)
+    args = parser.parse_args()
+
+    user_id = seed()
+    storage.set_storage(storage.LocalStorage(tempfile.mkdtemp()))
+    token = auth_tokens.issue_tokens("user", user_id, LOGIN)["access_token"]
+    result = asyncio.run(run(args.concurrency, args.uploads, {"Authorization": f"Bearer {token}"}))
+    print(f"загрузок/с: {result['uploads_per_sec']:.1f}   "
+          f"задержка GET /: p50 {result['ping_p50_ms']:.1f} мс, p95 {result['ping_p95_ms']:.1f} мс")
@@ -0,0 +1,60 @@
+# 🔄 Проверка: async-обработчики не работают с синхронной сессией БД на event loop.
+# Падает (код 1), если async def зависит от get_db / get_read_db или сам открывает SessionLocal().
+# Синхронную работу с БД из async-обработчика — через get_async_db (run_sync) или run_in_threadpool.
+# Пример: python -m tools.check_async_handlers
+import inspect
+import os
+import sys
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'handlers.db')}"
+os.environ.pop("REPLICA_DATABASE_URL", None)
+
+from fastapi.routing import APIRoute
+
+from db.database import get_db, get_read_db
+from main import app
+
+SYNC_SESSION_DEPENDENCIES = (get_db, get_read_db)
+
+
+def _routes(routes, prefix: str = ""):
+    for route in routes:
+        if isinstance(route, APIRoute):
+            yield prefix + route.path, route
+        elif hasattr(route, "original_router"):
+            # Подключённый через include_router роутер
+            yield from _routes(route.original_router.routes, prefix + route.include_context.prefix)
+
+
+def _dependencies(dependant):
+    for sub in dependant.dependencies:
+        yield sub.call
+        yield from _dependencies(sub)
+
+
+def check() -> list[str]:
+    problems = []
+    for path, route in _routes(app.routes):
+        if not inspect.iscoroutinefunction(route.endpoint):
+            continue
+        methods = ",".join(sorted(route.methods))
+        for call in _dependencies(route.dependant):
+            if call in SYNC_SESSION_DEPENDENCIES:
+                problems.append(f"{methods} {path}: async def с {call.__name__}")
+        try:
+            source = inspect.getsource(route.endpoint)
+        except OSError:
+            source = ""
+        if "SessionLocal()" in source:
+            problems.append(f"{methods} {path}: async def открывает SessionLocal()")
+    return problems
+
+
+if __name__ == "__main__":
+    problems = check()
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        sys.exit(1)
+    print("✅ Async-обработчики не используют синхронную сессию")
@@ -0,0 +1,108 @@
+# 🔢 Бюджет SQL-запросов на эндпоинт: падает (код 1), если обработчик делает больше запросов, чем разрешено.
+# Ловит N+1: бюджет не зависит от числа строк, поэтому данных сидируется заметно больше страницы.
+# Пример: python -m tools.check_query_budget --users 60
+# Работает на временной SQLite-базе (DATABASE_URL переопределяется до импорта приложения).
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'budget.db')}"
+os.environ.pop("REPLICA_DATABASE_URL", None)
+os.environ.setdefault("OCR_JOB_MODE", "external")
+
+from fastapi.testclient import TestClient
+
+from crud import subscription_crud
+from db.database import SessionLocal
+from main import app
+from models.admin_models import AdminUser
+from models.comment_models import Comment
+from models.payment_models import Payment
+from models.subscription_models import Subscription
+from models.upload_models import Upload
+from models.user_models import User
+from utils import auth as auth_tokens
+from utils import subscription_status
+
+# Путь → максимум SQL-запросов (кэши статуса подписки сброшены перед каждым запросом — худший случай)
+BUDGETS = {
+    "/user/?limit=50": 1,
+    "/user/{user_id}": 2,
+    "/user/user_info/{login}": 2,
+    "/user/user/{user_id}/subscription": 1,
+    "/user/subscription-status": 1,
+    "/user/me": 2,
+    "/upload/uploads/by-user?limit=50": 1,
+    "/comments/?limit=50": 1,
+    "/comments/category/positive?limit=50": 1,
+    "/comments/by-user/{user_id}?limit=50": 1,
+    "/comments/stats": 1,
+    "/payment/payments/by-user?user_id={user_id}&limit=50": 1,
+    "/payment/payments/all?limit=50": 1,
+    "/subscriptions/": 1,
+    "/subscriptions/subscription-info": 1,
+    "/admin/all": 1,
+}
+
+
+def seed(users: int) -> tuple[int, str]:
+    db = SessionLocal()
+    try:
+        free = Subscription(name="free", scan_limit=10, price=0, duration_days=30)
+        premium = Subscription(name="premium", scan_limit=1000, price=100, duration_days=30)
+        db.add_all([free, premium])
+        db.add(AdminUser(username="budget-admin", email="admin@example.com", password_hash="-"))
+        db.commit()
+
+        now = datetime.utcnow()
+        for i in range(users):
+            user = User(login=f"budget{i}", email=f"budget{i}@example.com", password_hash="-")
+            db.add(user)
+            db.commit()
+            subscription_crud.replace_active_subscription(db, user.id, premium if i % 2 else free)
+            for j in range(5):
+                stamp = now - timedelta(minutes=i * 10 + j)
+                db.add(Upload(filename=f"{i}_{j}.jpg", file_url="-", recognized_text="текст",
+                              uploaded_at=stamp, user_id=user.id))
+                db.add(Comment(user_id=user.id, email=user.email, review="ок", category="positive", date=stamp))
+                db.add(Payment(user_id=user.id, subscription_id=premium.id, amount=100, timestamp=stamp))
+            db.commit()
+
+        user = db.query(User).filter_by(login="budget1").first()
+        return user.id, user.login
+    finally:
+        db.close()
+
+
+def check(client: TestClient, user_id: int, login: str) -> list[str]:
+    token = auth_tokens.issue_tokens("user", user_id, login)["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    # Проверка токена (отзыв) закэширована после первого запроса — в бюджет эндпоинта не входит
+    client.get("/user/me", headers=headers)
+
+    failures = []
+    for path, budget in BUDGETS.items():
+        for cache in (subscription_status.status_cache, subscription_status.login_cache):
+            cache.clear()
+        response = client.get(path.format(user_id=user_id, login=login), headers=headers)
+        used = int(response.headers.get("X-DB-Queries", "-1"))
+        ok = response.status_code == 200 and 0 <= used <= budget
+        print(f"{'✅' if ok else '❌'} {path:55} {used:3} / {budget}   HTTP {response.status_code}")
+        if not ok:
+            failures.append(path)
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=60)
+    args = parser.parse_args()
+
+    user_id, login = seed(args.users)
+    failures = check(TestClient(app), user_id, login)
+    if failures:
+        print(f"Превышен бюджет запросов: {', '.join(failures)}")
+        sys.exit(1)
+    print("Все эндпоинты укладываются в бюджет")
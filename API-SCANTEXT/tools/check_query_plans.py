@@ -0,0 +1,75 @@
+# 🔍 Проверка планов горячих запросов: каждый должен идти по индексу, а не полным сканом таблицы.
+# Запуск: python -m tools.check_query_plans  (код возврата 1, если какой-то запрос не использует индекс)
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from db.database import build_engine
+from db.migrations import run_migrations
+from models import user_models, comment_models  # noqa: F401  (связи моделей)
+from models.payment_models import Payment
+from models.subscription_models import UserSubscription
+from models.upload_models import Upload
+
+
+def hot_queries(db):
+    # Те же запросы, что выполняют /upload/scan, /user/login, /payment/success,
+    # /payment/confirm-latest-payment и /upload/uploads/by-user
+    return {
+        "ix_user_subscriptions_user_active": db.query(UserSubscription)
+            .filter_by(user_id=7, is_active=True),
+        "ix_payments_transaction_id": db.query(Payment)
+            .filter_by(transaction_id="order-1"),
+        "ix_payments_user_status_timestamp": db.query(Payment)
+            .filter_by(user_id=7, status="pending")
+            .order_by(Payment.timestamp.desc()),
+        "ix_uploads_user_uploaded_at": db.query(Upload)
+            .filter_by(user_id=7)
+            .order_by(Upload.uploaded_at.desc()),
+    }
+
+
+def main() -> int:
+    path = os.path.join(tempfile.mkdtemp(), "plans.db")
+    engine = build_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+
+    # Немного данных и ANALYZE, чтобы планировщик выбирал как на живой базе
+    with engine.begin() as conn:
+        for i in range(2000):
+            conn.execute(
+                text("INSERT INTO payments (user_id, amount, currency, status, method, transaction_id, timestamp) "
+                     "VALUES (:u, 100, 'UAH', :s, 'monobank', :t, :ts)"),
+                {"u": i % 200, "s": "success" if i % 3 else "pending", "t": f"order-{i}", "ts": datetime.utcnow()}
+            )
+            conn.execute(
+                text("INSERT INTO uploads (user_id, filename, uploaded_at) VALUES (:u, 'f.jpg', :ts)"),
+                {"u": i % 200, "ts": datetime.utcnow()}
+            )
+        for user_id in range(200):
+            conn.execute(
+                text("INSERT INTO user_subscriptions (user_id, subscription_id, remaining_scans, is_active) "
+                     "VALUES (:u, 1, 10, 0), (:u, 1, 10, 1)"),
+                {"u": user_id}
+            )
+        conn.execute(text("ANALYZE"))
+
+    db = sessionmaker(bind=engine)()
+    failed = 0
+    for index_name, query in hot_queries(db).items():
+        sql = str(query.statement.compile(engine, compile_kwargs={"literal_binds": True}))
+        plan = " | ".join(row[-1] for row in db.execute(text("EXPLAIN QUERY PLAN " + sql)))
+        ok = index_name in plan
+        failed += not ok
+        print(f"{'✅' if ok else '❌'} {index_name}: {plan}")
+
+    db.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
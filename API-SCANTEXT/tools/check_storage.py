@@ -0,0 +1,66 @@
+# 🧪 Проверка S3-хранилища на локальном S3-совместимом сервере (MinIO, moto_server)
+# Пример:
+#   docker run -p 9000:9000 minio/minio server /data     (или: moto_server -p 9000)
+#   AWS_ACCESS_KEY_ID=minioadmin AWS_SECRET_ACCESS_KEY=minioadmin \
+#   S3_ENDPOINT_URL=http://localhost:9000 python -m tools.check_storage
+# Создаёт бакет, кладёт файл, проверяет exists/read и скачивает его по подписанной ссылке — без API.
+import os
+import sys
+import tempfile
+import uuid
+import urllib.request
+
+from utils import storage
+
+
+def main() -> int:
+    if not storage.S3_ENDPOINT_URL:
+        print("❌ Укажите S3_ENDPOINT_URL (например, http://localhost:9000)")
+        return 1
+
+    files = storage.S3Storage(bucket=f"scantext-check-{uuid.uuid4().hex[:8]}")
+    files.client.create_bucket(Bucket=files.bucket)
+    payload = os.urandom(64 * 1024)
+    filename = f"{uuid.uuid4().hex}{uuid.uuid4().hex}.png"
+    errors = []
+
+    temp_path = os.path.join(tempfile.mkdtemp(), "upload.part")
+    with open(temp_path, "wb") as f:
+        f.write(payload)
+    files.put_file(temp_path, filename)
+
+    if os.path.exists(temp_path):
+        errors.append("временный файл не удалён после put_file")
+    if not files.exists(filename):
+        errors.append("exists() не видит загруженный файл")
+    if files.exists("0" * 64 + ".png"):
+        errors.append("exists() нашёл несуществующий файл")
+    if files.read(filename) != payload:
+        errors.append("read() вернул другое содержимое")
+    try:
+        files.read("0" * 64 + ".png")
+        errors.append("read() несуществующего файла не вызвал FileNotFoundError")
+    except FileNotFoundError:
+        pass
+
+    key = files._key(filename)
+    head = files.client.head_object(Bucket=files.bucket, Key=key)
+    if head["ContentType"] != "image/png":
+        errors.append(f"ContentType={head['ContentType']}, ожидали image/png")
+    print(f"ключ в бакете: {key}")
+
+    url = files.download_url(filename)
+    with urllib.request.urlopen(url) as response:
+        if response.read() != payload:
+            errors.append("по подписанной ссылке пришло другое содержимое")
+    print(f"подписанная ссылка: {url.split('?')[0]}?…")
+
+    for error in errors:
+        print(f"❌ {error}")
+    if not errors:
+        print("✅ S3-хранилище работает")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+# 🧪 Локальная заглушка OCR-сервиса для нагрузочных тестов
+# Запуск: uvicorn tools.ocr_stub:app --port 9000
+# Затем: OCR_URL=http://127.0.0.1:9000/extract-text/
+import asyncio
+import hashlib
+import os
+import random
+
+from fastapi import FastAPI, UploadFile, File
+
+# Имитация времени распознавания (секунды)
+STUB_LATENCY = float(os.getenv("OCR_STUB_LATENCY", "0.2"))
+STUB_JITTER = float(os.getenv("OCR_STUB_JITTER", "0.05"))
+# Дополнительная задержка на каждый мегабайт изображения (реальный OCR медленнее на больших файлах)
+STUB_MS_PER_MB = float(os.getenv("OCR_STUB_MS_PER_MB", "0"))
+# Доля ответов с ошибкой 503 (для проверки повторов)
+STUB_ERROR_RATE = float(os.getenv("OCR_STUB_ERROR_RATE", "0"))
+# Доля «зависших» ответов с задержкой OCR_STUB_SLOW_LATENCY (хвост задержек — для проверки запасного сервиса)
+STUB_SLOW_RATE = float(os.getenv("OCR_STUB_SLOW_RATE", "0"))
+STUB_SLOW_LATENCY = float(os.getenv("OCR_STUB_SLOW_LATENCY", "5"))
+
+app = FastAPI()
+
+
+@app.post("/extract-text/")
+async def extract_text(file: UploadFile = File(...)):
+    data = await file.read()
+    delay = STUB_LATENCY + random.uniform(-STUB_JITTER, STUB_JITTER) + STUB_MS_PER_MB * len(data) / 1_000_000 / 1000
+    if STUB_SLOW_RATE and random.random() < STUB_SLOW_RATE:
+        delay = STUB_SLOW_LATENCY
+    await asyncio.sleep(max(0.0, delay))
+
+    if STUB_ERROR_RATE and random.random() < STUB_ERROR_RATE:
+        from fastapi.responses import JSONResponse
+        return JSONResponse({"detail": "stub error"}, status_code=503)
+
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    return {"text": f"stub text {digest} ({len(data)} bytes)"}
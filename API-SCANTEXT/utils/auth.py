@@ -0,0 +1,222 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from datetime import datetime
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db.database import SessionLocal
+from models.auth_models import RevokedToken
+from utils import subscription_status
+from utils.cache import TTLCache
+
+# ⚙️ Подписанные токены доступа (формат JWT, HS256 — только стандартная библиотека).
+# AUTH_SECRET обязательно задать в .env: без него ключ случайный и токены не переживут перезапуск.
+AUTH_SECRET = os.getenv("AUTH_SECRET") or secrets.token_urlsafe(32)
+ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", "900"))
+REFRESH_TOKEN_TTL = int(os.getenv("REFRESH_TOKEN_TTL", str(30 * 24 * 3600)))
+# Проверенные токены кэшируются: запрос с токеном не ходит в БД вовсе.
+# Отзыв в другом процессе вступает в силу не позже чем через AUTH_CLAIMS_CACHE_TTL секунд.
+AUTH_CLAIMS_CACHE_TTL = float(os.getenv("AUTH_CLAIMS_CACHE_TTL", "60"))
+AUTH_CLAIMS_CACHE_SIZE = int(os.getenv("AUTH_CLAIMS_CACHE_SIZE", "50000"))
+# Старые клиенты передают login параметром без токена — пока разрешено, но устарело:
+# так кто угодно может действовать от имени любого логина. После перехода клиентов на токены — AUTH_ALLOW_LOGIN_PARAM=0
+AUTH_ALLOW_LOGIN_PARAM = os.getenv("AUTH_ALLOW_LOGIN_PARAM", "1") == "1"
+
+if not os.getenv("AUTH_SECRET"):
+    print("⚠️ AUTH_SECRET не задан — используется случайный ключ, токены не переживут перезапуск")
+
+claims_cache = TTLCache(AUTH_CLAIMS_CACHE_TTL, AUTH_CLAIMS_CACHE_SIZE)
+bearer = HTTPBearer(auto_error=False)
+
+
+# 👤 Текущий пользователь из токена
+class CurrentUser:
+    def __init__(self, claims: dict):
+        self.kind = claims["kind"]  # "user" или "admin"
+        self.id = claims["sub"]
+        self.login = claims["login"]
+        self.role = claims.get("role")
+        self.claims = claims
+
+    @property
+    def is_admin(self) -> bool:
+        return self.kind == "admin" or self.role == "admin"
+
+
+# 🔐 Кодирование/проверка токена
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(signing_input: str) -> str:
+    return _b64encode(hmac.new(AUTH_SECRET.encode(), signing_input.encode(), hashlib.sha256).digest())
+
+
+_HEADER = _b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+
+def encode_token(claims: dict) -> str:
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    signing_input = f"{_HEADER}.{payload}"
+    return f"{signing_input}.{_sign(signing_input)}"
+
+
+def decode_token(token: str, token_type: str = "access") -> dict:
+    # Подпись и срок — без обращения к БД; отзыв проверяется отдельно
+    try:
+        header, payload, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(f"{header}.{payload}")):
+            raise ValueError
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=401, detail="Недействительный токен")
+
+    if claims.get("type") != token_type:
+        raise HTTPException(status_code=401, detail="Недействительный токен")
+    if claims.get("exp", 0) < time.time():
+        raise HTTPException(status_code=401, detail="Срок действия токена истёк")
+    return claims
+
+
+def _new_claims(kind: str, subject_id: int, login: str, role: str | None, token_type: str, ttl: int) -> dict:
+    now = int(time.time())
+    return {
+        "sub": subject_id,
+        "login": login,
+        "role": role,
+        "kind": kind,
+        "type": token_type,
+        "jti": secrets.token_hex(16),
+        "iat": now,
+        "exp": now + ttl,
+    }
+
+
+def issue_tokens(kind: str, subject_id: int, login: str, role: str | None = None) -> dict:
+    return {
+        "access_token": encode_token(_new_claims(kind, subject_id, login, role, "access", ACCESS_TOKEN_TTL)),
+        "refresh_token": encode_token(_new_claims(kind, subject_id, login, role, "refresh", REFRESH_TOKEN_TTL)),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL,
+    }
+
+
+# 🚫 Отзыв
+def is_revoked(db: Session, jti: str) -> bool:
+    return db.query(RevokedToken.jti).filter(RevokedToken.jti == jti).first() is not None
+
+
+# Вставка по первичному ключу jti сама проверяет, не отозван ли токен: из двух одновременных отзывов
+# проходит один. Возвращает False, если токен уже был отозван.
+def revoke(db: Session, claims: dict, token: str | None = None) -> bool:
+    # Истёкшие записи больше не нужны: токен и так не пройдёт проверку срока
+    db.query(RevokedToken).filter(RevokedToken.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+    db.add(RevokedToken(
+        jti=claims["jti"],
+        subject=f"{claims['kind']}:{claims['sub']}",
+        expires_at=datetime.utcfromtimestamp(claims["exp"])
+    ))
+    try:
+        db.commit()
+        revoked = True
+    except IntegrityError:
+        db.rollback()
+        revoked = False
+    if token is not None:
+        claims_cache.pop(token)
+    return revoked
+
+
+# 🔁 Ротация: старый refresh-токен отзывается, клиент получает новую пару
+def use_refresh_token(db: Session, refresh_token: str, kind: str) -> dict:
+    claims = decode_token(refresh_token, "refresh")
+    # Одновременные обновления одним токеном: новую пару получает только первый
+    if claims.get("kind") != kind or not revoke(db, claims):
+        raise HTTPException(status_code=401, detail="Токен отозван")
+    return claims
+
+
+def logout(db: Session, current: CurrentUser, access_token: str, refresh_token: str | None = None):
+    revoke(db, current.claims, access_token)
+    if refresh_token:
+        claims = decode_token(refresh_token, "refresh")
+        if claims.get("kind") == current.kind and claims.get("sub") == current.id:
+            revoke(db, claims)
+
+
+def _verify_access_token(token: str) -> dict:
+    claims = claims_cache.get(token)
+    if claims is not None and claims["exp"] >= time.time():
+        return claims
+
+    claims = decode_token(token, "access")
+    db = SessionLocal()
+    try:
+        if is_revoked(db, claims["jti"]):
+            raise HTTPException(status_code=401, detail="Токен отозван")
+    finally:
+        db.close()
+    claims_cache.set(token, claims)
+    return claims
+
+
+# 🧩 Зависимости FastAPI
+def get_optional_user(credentials: HTTPAuthorizationCredentials | None = Depends(bearer)) -> CurrentUser | None:
+    if credentials is None:
+        return None
+    return CurrentUser(_verify_access_token(credentials.credentials))
+
+
+def get_current_user(current: CurrentUser | None = Depends(get_optional_user)) -> CurrentUser:
+    if current is None:
+        raise HTTPException(status_code=401, detail="Требуется авторизация", headers={"WWW-Authenticate": "Bearer"})
+    return current
+
+
+def get_current_admin(current: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    if not current.is_admin:
+        raise HTTPException(status_code=403, detail="Нет доступа")
+    return current
+
+
+# 🔁 Переход со старого API: id пользователя из токена или (пока разрешено) из параметра login
+def resolve_user_id(db: Session, current: CurrentUser | None, login: str | None = None) -> int:
+    if current is not None and current.kind == "user":
+        if login and login != current.login and not current.is_admin:
+            raise HTTPException(status_code=403, detail="Нет доступа")
+        if not login or login == current.login:
+            return current.id
+
+    if login and (AUTH_ALLOW_LOGIN_PARAM or (current is not None and current.is_admin)):
+        user_id = subscription_status.get_user_id(db, login)
+        if user_id is None:
+            raise HTTPException(status_code=404, detail="Пользователь не найден")
+        return user_id
+
+    raise HTTPException(status_code=401, detail="Требуется авторизация", headers={"WWW-Authenticate": "Bearer"})
+
+
+# 🔐 Для новых эндпоинтов: только по токену; чужой login — только администратору
+def resolve_token_user_id(db: Session, current: CurrentUser, login: str | None = None) -> int:
+    if not login or (current.kind == "user" and login == current.login):
+        if current.kind != "user":
+            raise HTTPException(status_code=400, detail="Укажите login пользователя")
+        return current.id
+    if not current.is_admin:
+        raise HTTPException(status_code=403, detail="Нет доступа")
+    user_id = subscription_status.get_user_id(db, login)
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    return user_id
@@ -0,0 +1,92 @@
+import asyncio
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Настройки подготовки изображения перед OCR
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "1").lower() not in ("0", "false", "no")
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2000"))
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "1").lower() not in ("0", "false", "no")
+OCR_IMAGE_FORMAT = os.getenv("OCR_IMAGE_FORMAT", "JPEG").upper()  # JPEG | WEBP
+OCR_IMAGE_QUALITY = int(os.getenv("OCR_IMAGE_QUALITY", "85"))
+OCR_PREPROCESS_WORKERS = int(os.getenv("OCR_PREPROCESS_WORKERS", str(os.cpu_count() or 2)))
+
+_pool: ProcessPoolExecutor | None = None
+
+
+# 🔑 Строка с текущими настройками (меняется настройка — меняется результат OCR)
+def settings_signature() -> str:
+    if not OCR_PREPROCESS:
+        return "raw"
+    return f"{OCR_MAX_SIDE}:{OCR_TARGET_DPI}:{int(OCR_GRAYSCALE)}:{OCR_IMAGE_FORMAT}:{OCR_IMAGE_QUALITY}"
+
+
+def output_filename() -> str:
+    return "file.webp" if OCR_PREPROCESS and OCR_IMAGE_FORMAT == "WEBP" else "file.jpg"
+
+
+# 🖼 Поворот по EXIF, уменьшение, оттенки серого, пережатие.
+# Выполняется в отдельном процессе (CPU-bound, не держит GIL API-процесса).
+def preprocess_image_bytes(data: bytes) -> bytes:
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+
+        # Уменьшаем до целевого DPI, если он известен из метаданных
+        dpi = image.info.get("dpi") or original.info.get("dpi")
+        if OCR_TARGET_DPI and dpi and dpi[0] and dpi[0] > OCR_TARGET_DPI:
+            scale = OCR_TARGET_DPI / float(dpi[0])
+            image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.LANCZOS)
+
+        if OCR_MAX_SIDE and max(image.size) > OCR_MAX_SIDE:
+            image.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.LANCZOS)
+
+        if OCR_GRAYSCALE:
+            image = image.convert("L")
+        elif image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        buffer = io.BytesIO()
+        if OCR_IMAGE_FORMAT == "WEBP":
+            image.save(buffer, format="WEBP", quality=OCR_IMAGE_QUALITY, method=4)
+        else:
+            image.save(buffer, format="JPEG", quality=OCR_IMAGE_QUALITY, optimize=True)
+        return buffer.getvalue()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=OCR_PREPROCESS_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# 🚀 Подготовка изображения без блокировки event loop
+async def prepare_for_ocr(data: bytes) -> tuple[bytes, str]:
+    if not OCR_PREPROCESS:
+        return data, "file.jpg"
+
+    loop = asyncio.get_running_loop()
+    try:
+        prepared = await loop.run_in_executor(_get_pool(), preprocess_image_bytes, data)
+    except Exception as e:
+        # Не картинка или повреждённый файл — отправляем как есть
+        logger.warning("Предобработка изображения не удалась: %s", e)
+        return data, "file.jpg"
+
+    # Если пережатие не помогло (маленький исходник) — оставляем оригинал
+    if len(prepared) >= len(data):
+        return data, "file.jpg"
+    return prepared, output_filename()
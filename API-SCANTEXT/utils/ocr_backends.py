@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import os
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import ocr_client
+from utils.ocr_client import OCRError
+
+# ⚙️ Выбор OCR-бэкенда: remote (HTTP-сервис), tesseract (локально), stub (детерминированная заглушка)
+OCR_BACKEND = os.getenv("OCR_BACKEND", "remote").lower()
+OCR_LOCAL_WORKERS = int(os.getenv("OCR_LOCAL_WORKERS", str(os.cpu_count() or 2)))
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")
+TESSERACT_LANG = os.getenv("TESSERACT_LANG", "rus+eng")
+TESSERACT_TIMEOUT = float(os.getenv("TESSERACT_TIMEOUT", "60"))
+# Имитация CPU-нагрузки заглушки, мс на изображение
+OCR_STUB_CPU_MS = float(os.getenv("OCR_STUB_CPU_MS", "0"))
+
+
+# 🧩 Общий интерфейс OCR-бэкенда (бэкенд без recognize() не создастся — TypeError при запуске, а не на первом скане)
+class OCRBackend(ABC):
+    name = "base"
+    version = "1"
+
+    @abstractmethod
+    async def recognize(self, image_bytes: bytes, filename: str = "file.jpg") -> str:
+        ...
+
+    async def close(self):
+        pass
+
+
+# 🌐 Удалённый HTTP-сервис (пул соединений, таймауты и повторы — в ocr_client)
+class RemoteHTTPBackend(OCRBackend):
+    name = "remote"
+
+    def __init__(self, url: str | None = None, secondary_url: str | None = None):
+        self.url = url or ocr_client.OCR_URL
+        # Запасной сервис (OCR_SECONDARY_URL) должен распознавать так же — версия кэша по основному
+        self.secondary_url = secondary_url or ocr_client.OCR_SECONDARY_URL
+        self.version = self.url
+
+    async def recognize(self, image_bytes: bytes, filename: str = "file.jpg") -> str:
+        return await ocr_client.recognize_text(image_bytes, filename, url=self.url, secondary_url=self.secondary_url)
+
+    async def close(self):
+        await ocr_client.close_client()
+
+
+# ⚙️ Функции ниже выполняются в процессах пула, поэтому объявлены на уровне модуля
+
+def _run_tesseract(image_bytes: bytes, cmd: str, lang: str, timeout: float) -> str:
+    result = subprocess.run(
+        [cmd, "stdin", "stdout", "-l", lang],
+        input=image_bytes,
+        capture_output=True,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace")[:300])
+    return result.stdout.decode("utf-8", "replace")
+
+
+def _run_stub(image_bytes: bytes, cpu_ms: float) -> str:
+    # Детерминированный «распознанный» текст + при необходимости нагрузка на CPU
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    work = digest.encode()
+    deadline = time.perf_counter() + cpu_ms / 1000
+    while time.perf_counter() < deadline:
+        work = hashlib.sha256(work).digest()
+    return f"stub text {digest[:16]} ({len(image_bytes)} bytes)"
+
+
+# 🖥 Локальные бэкенды: распознавание в ProcessPoolExecutor по числу ядер
+class LocalProcessBackend(OCRBackend):
+    def __init__(self, workers: int = OCR_LOCAL_WORKERS):
+        self.workers = workers
+        self._pool: ProcessPoolExecutor | None = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def _run(self, func, *args) -> str:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_pool(), func, *args)
+        except Exception as e:
+            raise OCRError(f"Локальный OCR ({self.name}) завершился ошибкой: {e}")
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class TesseractBackend(LocalProcessBackend):
+    name = "tesseract"
+
+    def __init__(self, cmd: str = TESSERACT_CMD, lang: str = TESSERACT_LANG, workers: int = OCR_LOCAL_WORKERS):
+        super().__init__(workers)
+        self.cmd = cmd
+        self.lang = lang
+        self.version = self._detect_version()
+
+    def _detect_version(self) -> str:
+        try:
+            result = subprocess.run([self.cmd, "--version"], capture_output=True, timeout=10)
+            first_line = (result.stdout or result.stderr).decode("utf-8", "replace").splitlines()
+            return f"{first_line[0] if first_line else 'unknown'}:{self.lang}"
+        except (OSError, subprocess.SubprocessError):
+            return f"unknown:{self.lang}"
+
+    async def recognize(self, image_bytes: bytes, filename: str = "file.jpg") -> str:
+        return await self._run(_run_tesseract, image_bytes, self.cmd, self.lang, TESSERACT_TIMEOUT)
+
+
+class StubBackend(LocalProcessBackend):
+    name = "stub"
+
+    async def recognize(self, image_bytes: bytes, filename: str = "file.jpg") -> str:
+        return await self._run(_run_stub, image_bytes, OCR_STUB_CPU_MS)
+
+
+BACKENDS = {
+    "remote": RemoteHTTPBackend,
+    "tesseract": TesseractBackend,
+    "stub": StubBackend,
+}
+
+_backend: OCRBackend | None = None
+
+
+def get_backend() -> OCRBackend:
+    global _backend
+    if _backend is None:
+        if OCR_BACKEND not in BACKENDS:
+            raise RuntimeError(f"Неизвестный OCR_BACKEND={OCR_BACKEND}, доступны: {', '.join(BACKENDS)}")
+        _backend = BACKENDS[OCR_BACKEND]()
+    return _backend
+
+
+async def close_backend():
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
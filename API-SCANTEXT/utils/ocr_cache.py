@@ -0,0 +1,214 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from utils.cache import TTLCache
+from utils.image_preprocessing import settings_signature
+from utils.ocr_backends import get_backend
+
+# 🗂 Кэш результатов OCR: ключ — sha256 изображения + настройки подготовки + бэкенд и его версия.
+# Повторное сканирование (в том числе того же документа с другого аккаунта) не идёт во внешний OCR.
+# Два уровня: LRU в памяти процесса и SQLite-файл на диске (общий для воркеров, переживает перезапуск).
+# OCR_CACHE_MEMORY_SIZE <= 0 / OCR_CACHE_DISK_MAX_MB <= 0 — соответствующий уровень выключен.
+OCR_CACHE_MEMORY_SIZE = int(os.getenv("OCR_CACHE_MEMORY_SIZE", "1000"))
+OCR_CACHE_MEMORY_TTL = float(os.getenv("OCR_CACHE_MEMORY_TTL", str(24 * 3600)))
+# По умолчанию — рядом с основной базой (db/), а не в текущей папке запуска
+OCR_CACHE_PATH = os.getenv(
+    "OCR_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db", "ocr_cache.db")
+)
+OCR_CACHE_DISK_MAX_MB = float(os.getenv("OCR_CACHE_DISK_MAX_MB", "256"))
+# После переполнения удаляем давно не использованные записи до этой доли лимита (не на каждой записи)
+OCR_CACHE_EVICT_TO = float(os.getenv("OCR_CACHE_EVICT_TO", "0.9"))
+
+memory_cache = TTLCache(OCR_CACHE_MEMORY_TTL, OCR_CACHE_MEMORY_SIZE)
+
+
+def cache_key(content_hash: str, backend) -> str:
+    return hashlib.sha256(
+        f"{content_hash}|{settings_signature()}|{backend.name}|{backend.version}".encode()
+    ).hexdigest()
+
+
+# 💾 Дисковый уровень: одна таблица, вытеснение по суммарному размеру текстов (LRU по last_used).
+# Суммарный размер ведут триггеры в ocr_cache_meta — он общий для всех процессов, пишущих в файл.
+class DiskCache:
+    def __init__(self, path: str = OCR_CACHE_PATH, max_bytes: int = int(OCR_CACHE_DISK_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_cache ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_ocr_cache_last_used ON ocr_cache (last_used)")
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_cache_meta (id INTEGER PRIMARY KEY CHECK (id = 1), total_size INTEGER NOT NULL)"
+            )
+            # Файл кэша без счётчика (создан до него) — считаем один раз
+            conn.execute("INSERT OR IGNORE INTO ocr_cache_meta VALUES (1, (SELECT coalesce(sum(size), 0) FROM ocr_cache))")
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS ocr_cache_size_ins AFTER INSERT ON ocr_cache BEGIN "
+                "UPDATE ocr_cache_meta SET total_size = total_size + new.size WHERE id = 1; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS ocr_cache_size_upd AFTER UPDATE OF size ON ocr_cache BEGIN "
+                "UPDATE ocr_cache_meta SET total_size = total_size + new.size - old.size WHERE id = 1; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS ocr_cache_size_del AFTER DELETE ON ocr_cache BEGIN "
+                "UPDATE ocr_cache_meta SET total_size = total_size - old.size WHERE id = 1; END"
+            )
+            conn.execute("COMMIT")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> str | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT text FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE ocr_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, text: str):
+        if not self.enabled:
+            return
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            # UPSERT, а не INSERT OR REPLACE: замена через REPLACE не вызывает триггер удаления
+            conn.execute(
+                "INSERT INTO ocr_cache (key, text, size, created_at, last_used) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET text = excluded.text, size = excluded.size, last_used = excluded.last_used",
+                (key, text, size, now, now)
+            )
+            if self._total_size(conn) > self.max_bytes:
+                self._evict(conn)
+
+    def _total_size(self, conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT total_size FROM ocr_cache_meta WHERE id = 1").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection):
+        target = self.max_bytes * OCR_CACHE_EVICT_TO
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Размер читаем под блокировкой записи: другой процесс мог уже вытеснить
+            excess = self._total_size(conn) - target
+            keys = []
+            for key, size in conn.execute("SELECT key, size FROM ocr_cache ORDER BY last_used"):
+                if excess <= 0:
+                    break
+                keys.append((key,))
+                excess -= size
+            conn.executemany("DELETE FROM ocr_cache WHERE key = ?", keys)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.evictions += len(keys)
+
+    def clear(self):
+        with self._lock:
+            if self._conn is not None or os.path.exists(self.path):
+                self._connect().execute("DELETE FROM ocr_cache")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._total_size(self._connect()) if self.enabled else 0
+            total = self.hits + self.misses
+            return {
+                "path": self.path,
+                "size_bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+disk_cache = DiskCache()
+_lookups = 0
+_hits = 0
+_stats_lock = threading.Lock()
+
+
+def _count(hit: bool):
+    global _lookups, _hits
+    with _stats_lock:
+        _lookups += 1
+        _hits += hit
+
+
+# 🔎 Поиск: память -> диск (найденное на диске поднимаем в память). Дисковый уровень — вызывать в threadpool
+def lookup(content_hash: str | None, backend=None) -> str | None:
+    if not content_hash:
+        return None
+    key = cache_key(content_hash, backend or get_backend())
+
+    text = memory_cache.get(key)
+    if text is None:
+        text = disk_cache.get(key)
+        if text is not None:
+            memory_cache.set(key, text)
+    _count(text is not None)
+    return text
+
+
+def store(content_hash: str, text: str, backend=None):
+    key = cache_key(content_hash, backend or get_backend())
+    memory_cache.set(key, text)
+    disk_cache.set(key, text)
+
+
+def clear():
+    memory_cache.clear()
+    disk_cache.clear()
+
+
+def stats() -> dict:
+    with _stats_lock:
+        lookups, hits = _lookups, _hits
+    return {
+        "lookups": lookups,
+        "hits": hits,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "memory": memory_cache.stats(),
+        "disk": disk_cache.stats(),
+    }
@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import os
+import random
+import time
+
+import httpx
+
+from utils.resilience import CircuitBreaker, LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Настройки OCR-клиента (через переменные окружения / .env)
+OCR_URL = os.getenv("OCR_URL", "https://fastapitext.fly.dev/extract-text/")
+OCR_CONNECT_TIMEOUT = float(os.getenv("OCR_CONNECT_TIMEOUT", "5"))
+OCR_READ_TIMEOUT = float(os.getenv("OCR_READ_TIMEOUT", "60"))
+OCR_RETRIES = int(os.getenv("OCR_RETRIES", "2"))
+OCR_BACKOFF = float(os.getenv("OCR_BACKOFF", "0.5"))
+OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", "32"))
+OCR_MAX_CONNECTIONS = int(os.getenv("OCR_MAX_CONNECTIONS", str(OCR_MAX_CONCURRENCY)))
+# ⏱ Сроки: одна попытка целиком (не только чтение одного блока) и весь вызов с повторами и ожиданием в очереди
+OCR_ATTEMPT_TIMEOUT = float(os.getenv("OCR_ATTEMPT_TIMEOUT", str(OCR_READ_TIMEOUT)))
+OCR_TOTAL_TIMEOUT = float(os.getenv("OCR_TOTAL_TIMEOUT", "120"))
+# ⚡️ Автомат отключения: после OCR_BREAKER_FAILURES ошибок подряд запросы к этому адресу
+# сразу завершаются ошибкой OCR_BREAKER_RESET секунд, затем проходит один пробный (0 — выключен)
+OCR_BREAKER_FAILURES = int(os.getenv("OCR_BREAKER_FAILURES", "5"))
+OCR_BREAKER_RESET = float(os.getenv("OCR_BREAKER_RESET", "30"))
+# 🏁 Запасной OCR-сервис: если основной не ответил за OCR_HEDGE_PERCENTILE-й перцентиль своих задержек,
+# параллельно отправляем тот же запрос на запасной и берём первый ответ. Без OCR_SECONDARY_URL — выключено.
+OCR_SECONDARY_URL = os.getenv("OCR_SECONDARY_URL") or None
+OCR_HEDGE_PERCENTILE = float(os.getenv("OCR_HEDGE_PERCENTILE", "95"))
+OCR_HEDGE_MIN_SAMPLES = int(os.getenv("OCR_HEDGE_MIN_SAMPLES", "20"))
+OCR_HEDGE_DEFAULT_DELAY = float(os.getenv("OCR_HEDGE_DEFAULT_DELAY", "5"))  # пока замеров меньше OCR_HEDGE_MIN_SAMPLES
+OCR_HEDGE_MIN_DELAY = float(os.getenv("OCR_HEDGE_MIN_DELAY", "0.2"))
+OCR_LATENCY_WINDOW = int(os.getenv("OCR_LATENCY_WINDOW", "500"))
+
+# Коды ответа, при которых имеет смысл повторить запрос
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+# ❌ Ошибка при обращении к OCR-сервису
+class OCRError(Exception):
+    pass
+
+
+# ⚡️ Сервис отключён автоматом — запрос даже не отправлялся
+class OCRUnavailable(OCRError):
+    pass
+
+
+# 📡 Состояние одного адреса OCR: автомат отключения + задержки попыток
+class Endpoint:
+    def __init__(self):
+        self.breaker = CircuitBreaker(OCR_BREAKER_FAILURES, OCR_BREAKER_RESET)
+        self.latency = LatencyHistogram(OCR_LATENCY_WINDOW)
+
+    def success(self, started: float, outcome: str = "ok"):
+        self.latency.observe(time.perf_counter() - started, outcome)
+        self.breaker.record_success()
+
+    def failure(self, started: float, outcome: str):
+        self.latency.observe(time.perf_counter() - started, outcome)
+        self.breaker.record_failure()
+
+    def cancelled(self, started: float):
+        self.latency.observe(time.perf_counter() - started, "cancelled")
+        self.breaker.record_cancel()
+
+    def hedge_delay(self) -> float:
+        if self.latency.samples < OCR_HEDGE_MIN_SAMPLES:
+            return OCR_HEDGE_DEFAULT_DELAY
+        return max(OCR_HEDGE_MIN_DELAY, self.latency.percentile(OCR_HEDGE_PERCENTILE))
+
+    def stats(self) -> dict:
+        return {"breaker": self.breaker.stats(), "latency": self.latency.stats()}
+
+
+_endpoints: dict[str, Endpoint] = {}
+_hedging = {"hedged": 0, "secondary_won": 0, "failover": 0, "deadline_exceeded": 0}
+
+
+def get_endpoint(url: str) -> Endpoint:
+    if url not in _endpoints:
+        _endpoints[url] = Endpoint()
+    return _endpoints[url]
+
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_semaphore: asyncio.Semaphore | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    # 🔌 Один общий клиент с пулом keep-alive соединений на весь процесс
+    # (пересоздаётся, если сменился event loop — например, в тестах)
+    global _client, _client_loop, _semaphore
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client_loop = loop
+        _semaphore = asyncio.Semaphore(OCR_MAX_CONCURRENCY)
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(OCR_READ_TIMEOUT, connect=OCR_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=OCR_MAX_CONNECTIONS,
+                max_keepalive_connections=OCR_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+
+
+# 📨 Одна попытка. Исход всегда сообщается автомату: (текст, None) — успех, (None, ошибка) — можно повторить,
+# OCRError — повторять бессмысленно. Любое другое исключение тоже считается ошибкой попытки,
+# иначе пробный запрос в half_open «зависнет» и автомат останется закрытым для всех навсегда.
+async def _attempt(client: httpx.AsyncClient, endpoint: Endpoint, url: str, image_bytes: bytes, filename: str):
+    started = time.perf_counter()
+    try:
+        try:
+            response = await asyncio.wait_for(
+                client.post(url, files={"file": (filename, image_bytes)}), OCR_ATTEMPT_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            endpoint.failure(started, "timeout")
+            return None, OCRError(f"нет ответа за {OCR_ATTEMPT_TIMEOUT:g} с")
+        except httpx.TransportError as e:
+            endpoint.failure(started, "connection_error")
+            return None, e
+
+        if response.status_code in RETRY_STATUS_CODES:
+            endpoint.failure(started, f"http_{response.status_code}")
+            return None, OCRError(f"OCR вернул {response.status_code}")
+
+        if response.status_code != 200:
+            # Сервис отвечает — ошибка в самом запросе, автомат не трогаем
+            endpoint.success(started, f"http_{response.status_code}")
+            raise OCRError(f"OCR вернул {response.status_code}: {response.text[:200]}")
+
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            endpoint.failure(started, "invalid_json")
+            raise OCRError(f"OCR вернул некорректный JSON: {response.text[:200]}")
+        text = payload.get("text") or ""
+        if not isinstance(text, str):
+            endpoint.failure(started, "invalid_json")
+            raise OCRError(f"OCR вернул некорректный JSON: {response.text[:200]}")
+        endpoint.success(started)
+        return text, None
+    except OCRError:
+        raise
+    except asyncio.CancelledError:
+        endpoint.cancelled(started)
+        raise
+    except BaseException:
+        endpoint.failure(started, "unexpected_error")
+        raise
+
+
+# 🔁 Запрос к одному адресу OCR: ограничение параллельности, срок на попытку, повторы с backoff, автомат отключения
+async def _call(url: str, image_bytes: bytes, filename: str) -> str:
+    endpoint = get_endpoint(url)
+    client = get_client()
+    last_error = None
+
+    async with _semaphore:
+        for attempt in range(OCR_RETRIES + 1):
+            if attempt:
+                delay = OCR_BACKOFF * (2 ** (attempt - 1))
+                await asyncio.sleep(delay + random.uniform(0, delay))
+
+            if not endpoint.breaker.allow():
+                raise OCRUnavailable(
+                    f"OCR {url} временно отключён после ошибок "
+                    f"(повтор через {endpoint.breaker.retry_after():.0f} с)" + (f": {last_error}" if last_error else "")
+                )
+
+            text, error = await _attempt(client, endpoint, url, image_bytes, filename)
+            if error is None:
+                return text
+            last_error = error
+            logger.warning("OCR: %s (попытка %s)", error, attempt + 1)
+
+    raise OCRError(f"OCR недоступен: {last_error}")
+
+
+# 🏁 Основной адрес + запасной: запасной запускается, если основной медлит дольше перцентиля
+# своих задержек (или сразу после его ошибки); побеждает первый успешный ответ, второй отменяется
+async def _hedged_call(url: str, secondary_url: str, image_bytes: bytes, filename: str) -> str:
+    primary = asyncio.create_task(_call(url, image_bytes, filename))
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=get_endpoint(url).hedge_delay())
+        if done and primary.exception() is None:
+            return primary.result()
+
+        if done:
+            _hedging["failover"] += 1
+            if not isinstance(primary.exception(), OCRUnavailable):
+                logger.warning("OCR: основной сервис ответил ошибкой (%s), запрос — на запасной", primary.exception())
+            return await _call(secondary_url, image_bytes, filename)
+
+        _hedging["hedged"] += 1
+        secondary = asyncio.create_task(_call(secondary_url, image_bytes, filename))
+        tasks.add(secondary)
+        errors = []
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is secondary:
+                        _hedging["secondary_won"] += 1
+                    return task.result()
+                errors.append(task.exception())
+        raise errors[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def recognize_text(
+    image_bytes: bytes, filename: str = "file.jpg", url: str | None = None, secondary_url: str | None = None
+) -> str:
+    url = url or OCR_URL
+    if secondary_url and secondary_url != url:
+        call = _hedged_call(url, secondary_url, image_bytes, filename)
+    else:
+        call = _call(url, image_bytes, filename)
+    try:
+        return await asyncio.wait_for(call, OCR_TOTAL_TIMEOUT)
+    except asyncio.TimeoutError:
+        _hedging["deadline_exceeded"] += 1
+        raise OCRError(f"OCR не ответил за {OCR_TOTAL_TIMEOUT:g} с")
+
+
+# 📊 Состояние автоматов и гистограммы задержек по адресам
+def stats() -> dict:
+    return {
+        "primary_url": OCR_URL,
+        "secondary_url": OCR_SECONDARY_URL,
+        "attempt_timeout_seconds": OCR_ATTEMPT_TIMEOUT,
+        "total_timeout_seconds": OCR_TOTAL_TIMEOUT,
+        "hedging": {
+            **_hedging,
+            "enabled": OCR_SECONDARY_URL is not None,
+            "delay_ms": round(get_endpoint(OCR_URL).hedge_delay() * 1000, 1),
+        },
+        "endpoints": {url: endpoint.stats() for url, endpoint in _endpoints.items()},
+    }
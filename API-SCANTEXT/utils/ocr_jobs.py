@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from db.database import SessionLocal
+from models.ocr_job_models import OcrJob
+from models.upload_models import Upload
+from utils import quota, stats
+from utils.ocr_client import OCRError
+from utils.ocr_service import extract_text
+from utils.uploads import read_upload_bytes
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Настройки очереди OCR
+# OCR_JOB_MODE=inprocess — воркеры запускаются внутри API-процесса
+# OCR_JOB_MODE=external  — задачи забирает отдельный процесс (python worker.py)
+OCR_JOB_MODE = os.getenv("OCR_JOB_MODE", "inprocess")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "4"))
+OCR_JOB_POLL_INTERVAL = float(os.getenv("OCR_JOB_POLL_INTERVAL", "1"))
+# Через сколько секунд задача в статусе running считается брошенной
+OCR_JOB_STALE_SECONDS = int(os.getenv("OCR_JOB_STALE_SECONDS", "600"))
+# Сколько раз задача может быть взята в работу (брошенная задача возвращается в очередь, пока попытки не кончатся)
+OCR_JOB_MAX_ATTEMPTS = int(os.getenv("OCR_JOB_MAX_ATTEMPTS", "3"))
+
+_queue: asyncio.Queue | None = None
+_workers: list[asyncio.Task] = []
+
+
+# 📝 Создание задачи (вызывается из обработчика запроса)
+# Если текст уже известен (повторное изображение), задача сразу создаётся выполненной
+def create_job(db: Session, upload: Upload, user_subscription_id: int | None, recognized_text: str | None = None) -> OcrJob:
+    now = datetime.utcnow()
+    job = OcrJob(
+        upload_id=upload.id,
+        user_id=upload.user_id,
+        user_subscription_id=user_subscription_id,
+        status="queued" if recognized_text is None else "done",
+        recognized_text=recognized_text,
+        created_at=now,
+        finished_at=None if recognized_text is None else now
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def submit(job_id: int):
+    # В режиме inprocess будим воркеры сразу, иначе задачу найдёт внешний воркер
+    if _queue is not None:
+        _queue.put_nowait(job_id)
+
+
+# 🔒 Захват задачи: queued -> running условным UPDATE (безопасно для нескольких воркеров)
+def _claim_job(job_id: int | None = None):
+    db = SessionLocal()
+    try:
+        if job_id is None:
+            row = (
+                db.query(OcrJob.id)
+                .filter(OcrJob.status == "queued")
+                .order_by(OcrJob.id)
+                .first()
+            )
+            if not row:
+                return None
+            job_id = row.id
+
+        claimed = (
+            db.query(OcrJob)
+            .filter(OcrJob.id == job_id, OcrJob.status == "queued")
+            .update(
+                {"status": "running", "started_at": datetime.utcnow(), "attempts": OcrJob.attempts + 1},
+                synchronize_session=False
+            )
+        )
+        db.commit()
+        if not claimed:
+            return None
+
+        job = db.query(OcrJob).filter_by(id=job_id).first()
+        return job.id, job.upload.filename
+    finally:
+        db.close()
+
+
+# Статус меняется условным UPDATE: задачу могли вернуть в очередь как зависшую и взять другим воркером.
+# Готовый текст принимается и от «опоздавшего» воркера (running или уже queued)
+def _finish_job(job_id: int, text: str):
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            update(OcrJob)
+            .where(OcrJob.id == job_id, OcrJob.status.in_(("running", "queued")))
+            .values(status="done", recognized_text=text, finished_at=datetime.utcnow())
+            .returning(OcrJob.upload_id)
+        ).first()
+        if row is None:
+            db.rollback()
+            return
+        db.query(Upload).filter_by(id=row.upload_id).update({"recognized_text": text}, synchronize_session=False)
+        db.commit()
+        stats.scans_recorded(db, [row.upload_id])
+    finally:
+        db.close()
+
+
+# Ошибка — только для задачи в running: повторный вызов (задачу вернули в очередь и она упала ещё раз
+# у другого воркера, или её уже завершили) не возвращает сканирование второй раз
+def _fail_job(job_id: int, error: str):
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            update(OcrJob)
+            .where(OcrJob.id == job_id, OcrJob.status == "running")
+            .values(status="failed", error=error[:500], finished_at=datetime.utcnow())
+            .returning(OcrJob.user_id, OcrJob.user_subscription_id)
+        ).first()
+        if row is None:
+            db.rollback()
+            return
+
+        # 💸 Возвращаем списанное сканирование
+        if row.user_subscription_id:
+            quota.refund_subscription(db, row.user_id, row.user_subscription_id, 1, commit=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+# ⚙️ Выполнение одной задачи
+async def process_job(job_id: int | None = None) -> bool:
+    claimed = await run_in_threadpool(_claim_job, job_id)
+    if not claimed:
+        return False
+
+    job_id, filename = claimed
+    try:
+        image_bytes = await run_in_threadpool(read_upload_bytes, filename)
+        text = await extract_text(image_bytes)
+        await run_in_threadpool(_finish_job, job_id, text)
+    except (OCRError, OSError) as e:
+        logger.warning("OCR-задача %s завершилась ошибкой: %s", job_id, e)
+        await run_in_threadpool(_fail_job, job_id, str(e))
+    except Exception as e:
+        # Любая другая ошибка тоже завершает задачу — иначе она осталась бы в running с неистраченным списанием
+        logger.exception("OCR-задача %s: непредвиденная ошибка", job_id)
+        await run_in_threadpool(_fail_job, job_id, f"{type(e).__name__}: {e}")
+    return True
+
+
+# ♻️ Задачи, зависшие в статусе running после падения процесса, возвращаем в очередь;
+# исчерпавшие OCR_JOB_MAX_ATTEMPTS — завершаем ошибкой с возвратом сканирования.
+# Возвращает id задач, которые вернули в очередь
+def _requeue_stale_jobs() -> list[int]:
+    db = SessionLocal()
+    try:
+        stale_before = datetime.utcnow() - timedelta(seconds=OCR_JOB_STALE_SECONDS)
+        stale = db.query(OcrJob.id, OcrJob.attempts).filter(
+            OcrJob.status == "running", OcrJob.started_at < stale_before
+        ).order_by(OcrJob.id).all()
+
+        requeued, exhausted = [], []
+        for job_id, attempts in stale:
+            if attempts >= OCR_JOB_MAX_ATTEMPTS:
+                exhausted.append(job_id)
+                continue
+            # Условие повторяется: задачу мог завершить сам «зависший» воркер
+            if db.query(OcrJob).filter(
+                OcrJob.id == job_id, OcrJob.status == "running", OcrJob.started_at < stale_before
+            ).update({"status": "queued"}, synchronize_session=False):
+                requeued.append(job_id)
+        db.commit()
+    finally:
+        db.close()
+
+    for job_id in exhausted:
+        _fail_job(job_id, f"Задача не завершилась за {OCR_JOB_MAX_ATTEMPTS} попыток")
+    return requeued
+
+
+def _queued_job_ids() -> list[int]:
+    db = SessionLocal()
+    try:
+        return [row.id for row in db.query(OcrJob.id).filter(OcrJob.status == "queued").order_by(OcrJob.id)]
+    finally:
+        db.close()
+
+
+# ⏱ Периодический возврат зависших задач (если даже _fail_job не смог записать статус, например, БД была недоступна)
+async def _stale_jobs_loop():
+    while True:
+        await asyncio.sleep(OCR_JOB_STALE_SECONDS / 2)
+        try:
+            for job_id in await run_in_threadpool(_requeue_stale_jobs):
+                submit(job_id)
+        except Exception:
+            logger.exception("Не удалось вернуть зависшие OCR-задачи в очередь")
+
+
+async def _queue_worker():
+    while True:
+        job_id = await _queue.get()
+        try:
+            await process_job(job_id)
+        except Exception:
+            logger.exception("Ошибка воркера OCR (задача %s)", job_id)
+        finally:
+            _queue.task_done()
+
+
+# 🚀 Запуск/остановка воркеров внутри API-процесса
+async def start_workers():
+    global _queue
+    if OCR_JOB_MODE != "inprocess" or _workers:
+        return
+
+    _queue = asyncio.Queue()
+    # При старте — все ожидающие задачи, в том числе поставленные до перезапуска
+    await run_in_threadpool(_requeue_stale_jobs)
+    for job_id in await run_in_threadpool(_queued_job_ids):
+        _queue.put_nowait(job_id)
+
+    for _ in range(OCR_WORKERS):
+        _workers.append(asyncio.create_task(_queue_worker()))
+    _workers.append(asyncio.create_task(_stale_jobs_loop()))
+
+
+async def stop_workers():
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
+
+
+# 🛠 Отдельный процесс-воркер: опрашивает таблицу ocr_jobs
+async def run_polling_worker():
+    await run_in_threadpool(_requeue_stale_jobs)
+
+    async def loop():
+        while True:
+            try:
+                found = await process_job()
+            except Exception:
+                logger.exception("Ошибка воркера OCR")
+                found = False
+            if not found:
+                await asyncio.sleep(OCR_JOB_POLL_INTERVAL)
+
+    await asyncio.gather(*(loop() for _ in range(OCR_WORKERS)), _stale_jobs_loop())
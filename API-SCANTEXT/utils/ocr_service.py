@@ -0,0 +1,26 @@
+import hashlib
+
+from starlette.concurrency import run_in_threadpool
+
+from utils import ocr_cache
+from utils.image_preprocessing import prepare_for_ocr
+from utils.ocr_backends import get_backend
+
+
+def _cached_text(image_bytes: bytes, content_hash: str | None, backend, check_cache: bool) -> tuple[str, str | None]:
+    content_hash = content_hash or hashlib.sha256(image_bytes).hexdigest()
+    return content_hash, ocr_cache.lookup(content_hash, backend) if check_cache else None
+
+
+# 🔎 Полный путь распознавания: кэш результатов -> подготовка изображения -> OCR-бэкенд из настроек
+# check_cache=False — обработчик уже проверил кэш сам (до списания лимита)
+async def extract_text(image_bytes: bytes, content_hash: str | None = None, check_cache: bool = True) -> str:
+    backend = get_backend()
+    content_hash, text = await run_in_threadpool(_cached_text, image_bytes, content_hash, backend, check_cache)
+    if text is not None:
+        return text
+
+    prepared, filename = await prepare_for_ocr(image_bytes)
+    text = await backend.recognize(prepared, filename)
+    await run_in_threadpool(ocr_cache.store, content_hash, text, backend)
+    return text
@@ -0,0 +1,103 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import String, and_, literal, or_
+from sqlalchemy.orm import defer
+
+# ⚙️ Размер страницы для всех списков
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+# Курсор следующей страницы отдаётся в заголовке, тело ответа остаётся списком
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+# 🔐 Непрозрачный курсор: значения ключа сортировки последней строки страницы
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [
+            datetime.fromisoformat(v) if v is not None and column.type.python_type is datetime else v
+            for v, column in zip(values, columns)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+# 📄 Общие параметры списков: ?cursor=...&limit=...&fields=a,b,c
+class PageParams:
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+        limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+        fields: Optional[str] = Query(None, description="Необязательные поля через запятую, например: recognized_text")
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields is not None else None
+
+
+def _sqlite_datetime(value: datetime):
+    # SQLite хранит даты строками; старые записи — без микросекунд ("2025-04-24 15:10:30").
+    # Сравниваем строку в том же формате, иначе равные даты не совпадут.
+    text = value.strftime("%Y-%m-%d %H:%M:%S")
+    if value.microsecond:
+        text += f".{value.microsecond:06d}"
+    return literal(text, String)
+
+
+def _after(columns: list, values: list, descending: bool):
+    # (c1, c2) < (v1, v2)  ->  c1 < v1 OR (c1 = v1 AND c2 < v2)
+    column, value = columns[0], values[0]
+    beyond = column < value if descending else column > value
+    if len(columns) == 1:
+        return beyond
+    return or_(beyond, and_(column == value, _after(columns[1:], values[1:], descending)))
+
+
+# 📚 Keyset-пагинация + проекция полей.
+# order_columns — уникальный ключ сортировки, например (Upload.uploaded_at, Upload.id).
+# schema — Pydantic-схема ответа: обязательные поля отдаются всегда, необязательные — по ?fields=.
+def paginate(query, page: PageParams, response: Response, order_columns: tuple, schema=None, descending: bool = True):
+    columns = list(order_columns)
+
+    if page.cursor:
+        values = decode_cursor(page.cursor, columns)
+        if query.session.bind.dialect.name == "sqlite":
+            values = [_sqlite_datetime(v) if isinstance(v, datetime) else v for v in values]
+        query = query.filter(_after(columns, values, descending))
+
+    selected = None
+    if schema is not None and page.fields is not None:
+        required = {name for name, field in schema.model_fields.items() if field.is_required()}
+        selected = [name for name in schema.model_fields if name in required or name in page.fields]
+
+        # Невыбранные колонки не читаем из БД вовсе
+        entity = query.column_descriptions[0]["entity"]
+        skipped = [name for name in schema.model_fields if name not in selected and name in entity.__table__.columns]
+        if skipped:
+            query = query.options(*(defer(getattr(entity, name)) for name in skipped))
+
+    order = [c.desc() for c in columns] if descending else [c.asc() for c in columns]
+    rows = query.order_by(*order).limit(page.limit + 1).all()
+
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(last, c.key) for c in columns])
+
+    if selected is None:
+        return rows
+    return [{name: getattr(row, name) for name in selected if hasattr(row, name)} for row in rows]
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import os
+import threading
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from db.database import SessionLocal
+from models.subscription_models import UserSubscription
+from utils import subscription_status
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Счётчик лимита в памяти процесса — только для очень «горячих» аккаунтов.
+# Списания копятся в памяти и сбрасываются в БД пачкой (по таймеру или по порогу).
+# Работает корректно только при одном API-процессе, поэтому по умолчанию выключен.
+QUOTA_CACHE_ENABLED = os.getenv("QUOTA_CACHE_ENABLED", "0") == "1"
+QUOTA_FLUSH_INTERVAL = float(os.getenv("QUOTA_FLUSH_INTERVAL", "2"))
+QUOTA_FLUSH_THRESHOLD = int(os.getenv("QUOTA_FLUSH_THRESHOLD", "20"))
+
+
+# 🎟 Резерв сканирований: списано заранее, неиспользованное возвращается через refund()
+class Reservation:
+    def __init__(self, user_id: int, user_subscription_id: int, subscription_id: int, count: int, remaining: int):
+        self.user_id = user_id
+        self.user_subscription_id = user_subscription_id
+        self.subscription_id = subscription_id
+        self.count = count
+        self.remaining = remaining
+        self.settled = 0
+
+
+# 🔒 Атомарное списание в БД: UPDATE ... WHERE remaining_scans >= n RETURNING.
+# Проверка и уменьшение — одна операция, строка не блокируется на время OCR.
+def _reserve_in_db(db: Session, user_id: int, count: int):
+    condition = (
+        UserSubscription.user_id == user_id,
+        UserSubscription.is_active == True,
+        UserSubscription.remaining_scans >= count,
+    )
+    values = {"remaining_scans": UserSubscription.remaining_scans - count}
+
+    if db.bind.dialect.update_returning:
+        row = db.execute(
+            update(UserSubscription)
+            .where(*condition)
+            .values(**values)
+            .returning(UserSubscription.id, UserSubscription.subscription_id, UserSubscription.remaining_scans)
+            .execution_options(synchronize_session=False)
+        ).first()
+        return row
+
+    # БД без RETURNING (MySQL): то же условное UPDATE, затем читаем строку в той же транзакции
+    sub_id = db.execute(
+        select(UserSubscription.id).where(UserSubscription.user_id == user_id, UserSubscription.is_active == True)
+    ).scalar()
+    if sub_id is None:
+        return None
+    updated = db.execute(
+        update(UserSubscription)
+        .where(UserSubscription.id == sub_id, *condition)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        return None
+    return db.execute(
+        select(UserSubscription.id, UserSubscription.subscription_id, UserSubscription.remaining_scans)
+        .where(UserSubscription.id == sub_id)
+    ).first()
+
+
+def _refund_in_db(db: Session, user_subscription_id: int, count: int):
+    db.execute(
+        update(UserSubscription)
+        .where(UserSubscription.id == user_subscription_id)
+        .values(remaining_scans=UserSubscription.remaining_scans + count)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# 🧮 Счётчик в памяти: остаток по пользователю + несброшенное списание по подписке
+class QuotaCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[int, dict] = {}
+        self._pending: dict[int, int] = {}  # user_subscription_id -> сколько ещё не списано в БД
+
+    def _load(self, db: Session, user_id: int):
+        row = db.execute(
+            select(UserSubscription.id, UserSubscription.subscription_id, UserSubscription.remaining_scans)
+            .where(UserSubscription.user_id == user_id, UserSubscription.is_active == True)
+        ).first()
+        if row is None:
+            return None
+        with self._lock:
+            # Учитываем списания, которые ещё не дошли до БД
+            remaining = (row.remaining_scans or 0) - self._pending.get(row.id, 0)
+            return self._entries.setdefault(user_id, {
+                "user_subscription_id": row.id,
+                "subscription_id": row.subscription_id,
+                "remaining": remaining,
+            })
+
+    def reserve(self, db: Session, user_id: int, count: int) -> Reservation | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            entry = self._load(db, user_id)
+            if entry is None:
+                return None
+
+        with self._lock:
+            if entry["remaining"] < count:
+                return None
+            entry["remaining"] -= count
+            sub_id = entry["user_subscription_id"]
+            self._pending[sub_id] = self._pending.get(sub_id, 0) + count
+            reservation = Reservation(user_id, sub_id, entry["subscription_id"], count, entry["remaining"])
+            need_flush = sum(self._pending.values()) >= QUOTA_FLUSH_THRESHOLD
+
+        if need_flush:
+            self.flush()
+        return reservation
+
+    def refund(self, user_id: int, user_subscription_id: int, count: int) -> bool:
+        # Возврат в память, если подписка всё ещё в счётчике; иначе — сразу в БД
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry["user_subscription_id"] != user_subscription_id:
+                return False
+            entry["remaining"] += count
+            self._pending[user_subscription_id] = self._pending.get(user_subscription_id, 0) - count
+            return True
+
+    def remaining(self, user_id: int) -> int | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            return entry["remaining"] if entry else None
+
+    def flush(self):
+        with self._lock:
+            pending = {sub_id: n for sub_id, n in self._pending.items() if n}
+            self._pending.clear()
+        if not pending:
+            return
+
+        db = SessionLocal()
+        try:
+            for sub_id, n in pending.items():
+                db.execute(
+                    update(UserSubscription)
+                    .where(UserSubscription.id == sub_id)
+                    .values(remaining_scans=UserSubscription.remaining_scans - n)
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Не потеряли: вернём несброшенное обратно, попробуем в следующий раз
+            with self._lock:
+                for sub_id, n in pending.items():
+                    self._pending[sub_id] = self._pending.get(sub_id, 0) + n
+            raise
+        finally:
+            db.close()
+
+    def invalidate(self, user_id: int):
+        # Подписка сменилась — сбрасываем накопленное и перечитаем остаток из БД
+        with self._lock:
+            self._entries.pop(user_id, None)
+        self.flush()
+
+
+counter = QuotaCounter()
+
+
+# 📥 Публичный API: reserve -> (OCR) -> commit / refund
+def reserve(db: Session, user_id: int, count: int = 1, commit: bool = True) -> Reservation | None:
+    # None — активной подписки нет или не хватает сканирований
+    if QUOTA_CACHE_ENABLED:
+        return counter.reserve(db, user_id, count)
+
+    row = _reserve_in_db(db, user_id, count)
+    if commit:
+        # Коммитим и при отказе: UPDATE без совпадений тоже держит блокировку записи (SQLite)
+        db.commit()
+    if row is None:
+        return None
+    subscription_status.update_remaining(user_id, row.remaining_scans)
+    return Reservation(user_id, row.id, row.subscription_id, count, row.remaining_scans)
+
+
+def commit(reservation: Reservation, count: int | None = None):
+    # Подтверждаем использованные сканирования (списание уже сделано при резерве)
+    count = reservation.count - reservation.settled if count is None else count
+    reservation.settled += count
+
+
+def refund(db: Session, reservation: Reservation, count: int | None = None, commit: bool = True):
+    # Возвращаем сканирования, которые так и не были использованы (например, OCR упал)
+    count = reservation.count - reservation.settled if count is None else count
+    if count <= 0:
+        return
+    reservation.settled += count
+    reservation.remaining += count
+    refund_subscription(db, reservation.user_id, reservation.user_subscription_id, count, commit=commit)
+
+
+def refund_subscription(db: Session, user_id: int, user_subscription_id: int, count: int = 1, commit: bool = True):
+    # Возврат по id подписки — для фоновых задач, где объекта Reservation уже нет
+    if QUOTA_CACHE_ENABLED and counter.refund(user_id, user_subscription_id, count):
+        return
+    _refund_in_db(db, user_subscription_id, count)
+    if commit:
+        db.commit()
+    subscription_status.invalidate(user_id)
+
+
+def invalidate(user_id: int):
+    # Вызывать после смены активной подписки пользователя
+    if QUOTA_CACHE_ENABLED:
+        counter.invalidate(user_id)
+
+
+# ♻️ Периодический сброс счётчика в БД (запускается в lifespan)
+_flusher: asyncio.Task | None = None
+
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(QUOTA_FLUSH_INTERVAL)
+        try:
+            await run_in_threadpool(counter.flush)
+        except Exception:
+            logger.exception("Не удалось сбросить счётчик лимитов в БД")
+
+
+async def start_flusher():
+    global _flusher
+    if QUOTA_CACHE_ENABLED and _flusher is None:
+        _flusher = asyncio.create_task(_flush_loop())
+
+
+async def stop_flusher():
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        await asyncio.gather(_flusher, return_exceptions=True)
+        _flusher = None
+    if QUOTA_CACHE_ENABLED:
+        await run_in_threadpool(counter.flush)
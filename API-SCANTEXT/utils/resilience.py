@@ -0,0 +1,119 @@
+import bisect
+import time
+from collections import deque
+
+# 🛡 Защита вызовов внешних сервисов (OCR): автомат отключения и гистограмма задержек.
+# Состояние — в памяти процесса, используется из одного event loop (без блокировок).
+
+
+# ⚡️ Автомат отключения (circuit breaker):
+# closed — запросы идут; failure_threshold ошибок подряд -> open — запросы сразу отклоняются;
+# через reset_timeout секунд -> half_open — проходит один пробный запрос: успех закрывает, ошибка снова открывает.
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened_count = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def allow(self) -> bool:
+        if not self.enabled or self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self._probe_in_flight:
+            self.rejected += 1
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        if not self.enabled:
+            return
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened_count += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def record_cancel(self):
+        # Запрос отменён (например, победил параллельный запрос) — о здоровье сервиса ничего не говорит
+        self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opened_count": self.opened_count,
+            "rejected": self.rejected,
+            "retry_after_seconds": round(self.retry_after(), 1),
+        }
+
+
+# 📈 Гистограмма задержек: накопительные корзины (для /stats) + последние успешные замеры для перцентилей
+class LatencyHistogram:
+    BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+
+    def __init__(self, window: int = 500):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.outcomes: dict[str, int] = {}
+        self.total_ms = 0.0
+        self._recent: deque = deque(maxlen=window)
+
+    def observe(self, seconds: float, outcome: str = "ok"):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, ms)] += 1
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.total_ms += ms
+        if outcome == "ok":
+            self._recent.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        # p — от 0 до 100, по последним успешным запросам (в секундах)
+        if not self._recent:
+            return None
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    @property
+    def samples(self) -> int:
+        return len(self._recent)
+
+    def stats(self) -> dict:
+        count = sum(self.counts)
+        labels = [f"le_{bound}ms" for bound in self.BUCKETS_MS] + ["gt_60000ms"]
+        percentiles = {}
+        for p in (50, 90, 95, 99):
+            value = self.percentile(p)
+            percentiles[f"p{p}_ms"] = round(value * 1000, 1) if value is not None else None
+        return {
+            "count": count,
+            "mean_ms": round(self.total_ms / count, 1) if count else None,
+            **percentiles,
+            "outcomes": dict(self.outcomes),
+            "buckets": dict(zip(labels, self.counts)),
+        }
@@ -0,0 +1,178 @@
+import html
+import os
+import re
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Float, Integer, column, text
+from sqlalchemy.orm import Session
+
+from utils.pagination import NEXT_CURSOR_HEADER, PageParams, decode_cursor, encode_cursor
+
+# 🔎 Полнотекстовый поиск по распознанному тексту загрузок.
+# SQLite — FTS5 (внешний контент через представление, синхронизация триггерами),
+# Postgres — вычисляемая колонка tsvector + GIN-индекс. Индекс обновляется самой БД при любой записи
+# recognized_text (scan_image, воркеры OCR, пакетное сканирование), код приложения его не трогает.
+SEARCH_HIGHLIGHT_OPEN = os.getenv("SEARCH_HIGHLIGHT_OPEN", "<mark>")
+SEARCH_HIGHLIGHT_CLOSE = os.getenv("SEARCH_HIGHLIGHT_CLOSE", "</mark>")
+SEARCH_SNIPPET_TOKENS = int(os.getenv("SEARCH_SNIPPET_TOKENS", "16"))
+SEARCH_MAX_TERMS = int(os.getenv("SEARCH_MAX_TERMS", "8"))
+# Поиск по префиксу — по явной звёздочке: «молок*» → молоко, молока. Короткие префиксы
+# разворачиваются в тысячи слов индекса, поэтому минимальная длина ограничена.
+SEARCH_PREFIX_MIN_LENGTH = int(os.getenv("SEARCH_PREFIX_MIN_LENGTH", "3"))
+
+# Фрагмент строится с маркерами из области частного использования Unicode, затем экранируется целиком
+# и только после этого маркеры заменяются на SEARCH_HIGHLIGHT_OPEN/CLOSE: HTML из распознанного текста
+# (например, «<script>» на сфотографированной странице) попадает клиенту только как текст.
+_MARK_OPEN = "\ue000"
+_MARK_CLOSE = "\ue001"
+
+# Ключ курсора: (score, id); score — чем меньше, тем релевантнее
+_CURSOR_COLUMNS = [column("score", Float()), column("id", Integer())]
+
+
+# 🧱 DDL индекса (вызывается из миграции 0006)
+_SQLITE_DDL = [
+    # Владелец — отдельная колонка-токен «u<id>»: фильтр по пользователю выполняется внутри индекса.
+    # prefix='3 4' — отдельные индексы коротких префиксов, чтобы «чек*» не перебирал весь словарь
+    """CREATE VIEW IF NOT EXISTS uploads_fts_source AS
+       SELECT id, recognized_text, 'u' || user_id AS owner FROM uploads""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS uploads_fts USING fts5(
+           recognized_text, owner,
+           content='uploads_fts_source', content_rowid='id',
+           tokenize='unicode61 remove_diacritics 2',
+           prefix='3 4'
+       )""",
+    """CREATE TRIGGER IF NOT EXISTS uploads_fts_insert AFTER INSERT ON uploads BEGIN
+           INSERT INTO uploads_fts(rowid, recognized_text, owner)
+           VALUES (new.id, new.recognized_text, 'u' || new.user_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS uploads_fts_delete AFTER DELETE ON uploads BEGIN
+           INSERT INTO uploads_fts(uploads_fts, rowid, recognized_text, owner)
+           VALUES ('delete', old.id, old.recognized_text, 'u' || old.user_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS uploads_fts_update AFTER UPDATE OF recognized_text, user_id ON uploads BEGIN
+           INSERT INTO uploads_fts(uploads_fts, rowid, recognized_text, owner)
+           VALUES ('delete', old.id, old.recognized_text, 'u' || old.user_id);
+           INSERT INTO uploads_fts(rowid, recognized_text, owner)
+           VALUES (new.id, new.recognized_text, 'u' || new.user_id);
+       END""",
+    "INSERT INTO uploads_fts(uploads_fts) VALUES ('rebuild')",
+]
+
+# 'simple' — без стемминга: тексты на русском, украинском и английском вперемешку
+_POSTGRES_DDL = [
+    """ALTER TABLE uploads ADD COLUMN IF NOT EXISTS search_vector tsvector
+       GENERATED ALWAYS AS (to_tsvector('simple', coalesce(recognized_text, ''))) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_uploads_search_vector ON uploads USING GIN (search_vector)",
+]
+
+
+def create_index(conn):
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        statements = _SQLITE_DDL
+    elif dialect == "postgresql":
+        statements = _POSTGRES_DDL
+    else:
+        print(f"⚠️ Полнотекстовый индекс для {dialect} не поддерживается — поиск будет через LIKE")
+        return
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+# 🔤 Запрос пользователя → [(слово, префикс?)] (остальные операторы FTS из ввода не пропускаем)
+def _terms(q: str) -> list[tuple[str, bool]]:
+    terms = [
+        (word, star == "*" and len(word) >= SEARCH_PREFIX_MIN_LENGTH)
+        for word, star in re.findall(r"(\w+)(\*?)", q.lower())
+    ][:SEARCH_MAX_TERMS]
+    if not terms:
+        raise HTTPException(status_code=400, detail="Пустой поисковый запрос")
+    return terms
+
+
+def _sqlite_match(terms: list[tuple[str, bool]], user_id: int) -> str:
+    words = " ".join(f'"{word}"' + ("*" if prefix else "") for word, prefix in terms)
+    return f'owner : "u{user_id}" AND recognized_text : ({words})'
+
+
+def _postgres_tsquery(terms: list[tuple[str, bool]]) -> str:
+    return " & ".join(word + (":*" if prefix else "") for word, prefix in terms)
+
+
+# 📚 Поиск по загрузкам пользователя: релевантные сверху, курсор — в заголовке X-Next-Cursor
+def search_uploads(db: Session, user_id: int, q: str, page: PageParams, response: Response) -> list[dict]:
+    terms = _terms(q)
+    params = {
+        "user_id": user_id,
+        "limit": page.limit + 1,
+        "open": _MARK_OPEN,
+        "close": _MARK_CLOSE,
+        "tokens": SEARCH_SNIPPET_TOKENS,
+    }
+    after = ""
+    if page.cursor:
+        params["after_score"], params["after_id"] = decode_cursor(page.cursor, _CURSOR_COLUMNS)
+        after = "WHERE score > :after_score OR (score = :after_score AND id > :after_id)"
+
+    dialect = db.bind.dialect.name
+    if dialect == "sqlite":
+        params["match"] = _sqlite_match(terms, user_id)
+        sql = f"""
+            SELECT * FROM (
+                SELECT u.id, u.filename, u.file_url, u.uploaded_at,
+                       snippet(uploads_fts, 0, :open, :close, '…', :tokens) AS snippet,
+                       bm25(uploads_fts, 1.0, 0.0) AS score
+                FROM uploads_fts JOIN uploads u ON u.id = uploads_fts.rowid
+                WHERE uploads_fts MATCH :match
+            ) {after}
+            ORDER BY score, id LIMIT :limit
+        """
+    elif dialect == "postgresql":
+        params["tsquery"] = _postgres_tsquery(terms)
+        params["headline"] = f"StartSel={_MARK_OPEN}, StopSel={_MARK_CLOSE}, MaxWords={SEARCH_SNIPPET_TOKENS}, MinWords=5"
+        # Фрагменты (ts_headline — дорогая функция) строим только для строк страницы
+        sql = f"""
+            WITH hits AS (
+                SELECT * FROM (
+                    SELECT id, -ts_rank_cd(search_vector, to_tsquery('simple', :tsquery)) AS score
+                    FROM uploads
+                    WHERE user_id = :user_id AND search_vector @@ to_tsquery('simple', :tsquery)
+                ) ranked {after}
+                ORDER BY score, id LIMIT :limit
+            )
+            SELECT u.id, u.filename, u.file_url, u.uploaded_at,
+                   ts_headline('simple', u.recognized_text, to_tsquery('simple', :tsquery), :headline) AS snippet,
+                   hits.score
+            FROM hits JOIN uploads u ON u.id = hits.id
+            ORDER BY hits.score, hits.id
+        """
+    else:
+        # Нет полнотекстового индекса: все слова через LIKE, по новизне
+        conditions = []
+        for i, (term, _) in enumerate(terms):
+            params[f"term{i}"] = f"%{term}%"
+            conditions.append(f"lower(recognized_text) LIKE :term{i}")
+        sql = f"""
+            SELECT * FROM (
+                SELECT id, filename, file_url, uploaded_at, substr(recognized_text, 1, 200) AS snippet, -id AS score
+                FROM uploads WHERE user_id = :user_id AND {" AND ".join(conditions)}
+            ) found {after}
+            ORDER BY score, id LIMIT :limit
+        """
+
+    rows = db.execute(text(sql), params).mappings().all()
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([rows[-1]["score"], rows[-1]["id"]])
+    return [{**row, "snippet": _safe_snippet(row["snippet"])} for row in rows]
+
+
+def _safe_snippet(snippet: str | None) -> str | None:
+    if snippet is None:
+        return None
+    return (
+        html.escape(snippet, quote=False)
+        .replace(_MARK_OPEN, SEARCH_HIGHLIGHT_OPEN)
+        .replace(_MARK_CLOSE, SEARCH_HIGHLIGHT_CLOSE)
+    )
@@ -0,0 +1,336 @@
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import String, delete, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from db.database import SessionLocal
+from models.comment_models import Comment
+from models.payment_models import Payment
+from models.stats_models import CommentCategoryCount, DailyPlanMix, DailyRevenue, DailyUserActivity
+from models.subscription_models import Subscription, UserSubscription
+from models.upload_models import Upload
+from models.user_models import User
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Агрегаты для админ-панели: фоновая задача раз в STATS_REFRESH_INTERVAL секунд
+# пересчитывает последние STATS_REFRESH_DAYS дней; скан или оплата более старой записи сразу пересчитывает
+# свой день (scans_recorded / payments_recorded). Отзывы считаются сразу при записи.
+# STATS_REFRESH_INTERVAL <= 0 — фоновая задача выключена.
+STATS_REFRESH_INTERVAL = float(os.getenv("STATS_REFRESH_INTERVAL", "300"))
+STATS_REFRESH_DAYS = int(os.getenv("STATS_REFRESH_DAYS", "2"))
+STATS_RANGE_DEFAULT_DAYS = int(os.getenv("STATS_RANGE_DEFAULT_DAYS", "30"))
+STATS_RANGE_MAX_DAYS = int(os.getenv("STATS_RANGE_MAX_DAYS", "366"))
+
+
+# 📅 Диапазон дат для /admin/stats/*: ?date_from=2025-01-01&date_to=2025-01-31 (включительно)
+class DateRange:
+    def __init__(
+        self,
+        date_from: Optional[date] = Query(None, description="Первый день (по умолчанию — 30 дней назад)"),
+        date_to: Optional[date] = Query(None, description="Последний день включительно (по умолчанию — сегодня)")
+    ):
+        self.date_to = date_to or datetime.utcnow().date()
+        self.date_from = date_from or self.date_to - timedelta(days=STATS_RANGE_DEFAULT_DAYS - 1)
+        if self.date_from > self.date_to:
+            raise HTTPException(status_code=400, detail="date_from позже date_to")
+        if (self.date_to - self.date_from).days >= STATS_RANGE_MAX_DAYS:
+            raise HTTPException(status_code=400, detail=f"Диапазон не больше {STATS_RANGE_MAX_DAYS} дней")
+
+
+def _as_date(value) -> date:
+    # func.date() в SQLite возвращает строку, в Postgres — date
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _day_start(db: Session, day: date):
+    # SQLite хранит даты строками: сравниваем со строкой, иначе запись ровно в полночь выпадет
+    if db.bind.dialect.name == "sqlite":
+        return literal(day.isoformat(), String)
+    return datetime.combine(day, datetime.min.time())
+
+
+# 🔄 Пересчёт агрегатов из исходных таблиц (since=None — полностью; until — первый день, который не трогаем)
+def _refresh_activity(db: Session, since: date | None, until: date | None = None, user_id: int | None = None):
+    day = func.date(Upload.uploaded_at)
+    query = (
+        select(day, Upload.user_id, func.count(Upload.id), func.count(Upload.recognized_text))
+        .where(Upload.user_id.isnot(None))
+        .group_by(day, Upload.user_id)
+    )
+    cleanup = delete(DailyUserActivity)
+    if since is not None:
+        query = query.where(Upload.uploaded_at >= _day_start(db, since))
+        cleanup = cleanup.where(DailyUserActivity.day >= since)
+    if until is not None:
+        query = query.where(Upload.uploaded_at < _day_start(db, until))
+        cleanup = cleanup.where(DailyUserActivity.day < until)
+    if user_id is not None:
+        query = query.where(Upload.user_id == user_id)
+        cleanup = cleanup.where(DailyUserActivity.user_id == user_id)
+
+    rows = [
+        {"day": _as_date(d), "user_id": uid, "uploads": uploads, "scans": scans}
+        for d, uid, uploads, scans in db.execute(query)
+    ]
+    db.execute(cleanup)
+    if rows:
+        db.execute(insert(DailyUserActivity), rows)
+
+
+def _refresh_revenue(db: Session, since: date | None, until: date | None = None):
+    day = func.date(Payment.timestamp)
+    plan = func.coalesce(Payment.subscription_id, 0)
+    query = (
+        select(day, plan, Payment.currency, func.count(Payment.id), func.sum(Payment.amount))
+        .where(Payment.status == "success")
+        .group_by(day, plan, Payment.currency)
+    )
+    cleanup = delete(DailyRevenue)
+    if since is not None:
+        query = query.where(Payment.timestamp >= _day_start(db, since))
+        cleanup = cleanup.where(DailyRevenue.day >= since)
+    if until is not None:
+        query = query.where(Payment.timestamp < _day_start(db, until))
+        cleanup = cleanup.where(DailyRevenue.day < until)
+
+    rows = [
+        {"day": _as_date(d), "subscription_id": sub_id, "currency": currency, "payments": count, "amount": amount or 0}
+        for d, sub_id, currency, count, amount in db.execute(query)
+    ]
+    db.execute(cleanup)
+    if rows:
+        db.execute(insert(DailyRevenue), rows)
+
+
+def _snapshot_plan_mix(db: Session):
+    # Историю активных подписок из исходных таблиц не восстановить — снимок только на сегодня
+    today = datetime.utcnow().date()
+    rows = [
+        {"day": today, "subscription_id": sub_id, "active": count}
+        for sub_id, count in db.execute(
+            select(UserSubscription.subscription_id, func.count(UserSubscription.id))
+            .where(UserSubscription.is_active == True, UserSubscription.subscription_id.isnot(None))
+            .group_by(UserSubscription.subscription_id)
+        )
+    ]
+    db.execute(delete(DailyPlanMix).where(DailyPlanMix.day == today))
+    if rows:
+        db.execute(insert(DailyPlanMix), rows)
+
+
+def _rebuild_comment_categories(db: Session):
+    now = datetime.utcnow()
+    rows = [
+        {"category": category, "count": count, "updated_at": now}
+        for category, count in db.execute(select(Comment.category, func.count(Comment.id)).group_by(Comment.category))
+    ]
+    db.execute(delete(CommentCategoryCount))
+    if rows:
+        db.execute(insert(CommentCategoryCount), rows)
+
+
+def refresh(db: Session, since: date | None = None):
+    _refresh_activity(db, since)
+    _refresh_revenue(db, since)
+    _snapshot_plan_mix(db)
+    if since is None:
+        _rebuild_comment_categories(db)
+    db.commit()
+
+
+def rebuild(db: Session):
+    refresh(db, since=None)
+
+
+def _recent_since() -> date:
+    return datetime.utcnow().date() - timedelta(days=STATS_REFRESH_DAYS - 1)
+
+
+def refresh_recent():
+    db = SessionLocal()
+    try:
+        refresh(db, since=_recent_since())
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# ✍️ Обновление при записи: скан или оплата записи, чей день уже вне окна фонового пересчёта
+# (загрузку распознали через неделю, счёт оплатили через несколько дней) — пересчитываем этот день сразу.
+# Вызывать после коммита основной записи: при гонке с параллельным пересчётом делается откат.
+def _refresh_old_days(db: Session, days: set, refresh_day):
+    since = _recent_since()
+    for key in days:
+        if key[0] >= since:
+            continue
+        for attempt in range(2):
+            try:
+                refresh_day(*key)
+                db.commit()
+                break
+            except IntegrityError:
+                # Тот же день одновременно пересчитал другой запрос — пересчитываем ещё раз
+                db.rollback()
+                if attempt:
+                    raise
+
+
+def scans_recorded(db: Session, upload_ids: list[int]):
+    if not upload_ids:
+        return
+    days = {
+        (_as_date(d), user_id)
+        for user_id, d in db.execute(
+            select(Upload.user_id, func.date(Upload.uploaded_at))
+            .where(Upload.id.in_(upload_ids), Upload.user_id.isnot(None), Upload.uploaded_at.isnot(None))
+            .distinct()
+        )
+    }
+    _refresh_old_days(db, days, lambda day, user_id: _refresh_activity(db, day, day + timedelta(days=1), user_id))
+
+
+def payments_recorded(db: Session, payment_ids: list[int]):
+    days = {
+        (_as_date(d),)
+        for (d,) in db.execute(
+            select(func.date(Payment.timestamp))
+            .where(Payment.id.in_(payment_ids), Payment.timestamp.isnot(None))
+            .distinct()
+        )
+    }
+    _refresh_old_days(db, days, lambda day: _refresh_revenue(db, day, day + timedelta(days=1)))
+
+
+# ✍️ Обновление при записи: новый отзыв
+def comment_added(db: Session, category: str):
+    values = {"count": CommentCategoryCount.count + 1, "updated_at": datetime.utcnow()}
+    updated = db.execute(
+        update(CommentCategoryCount).where(CommentCategoryCount.category == category).values(**values)
+    ).rowcount
+    if not updated:
+        try:
+            db.execute(insert(CommentCategoryCount).values(category=category, count=1, updated_at=datetime.utcnow()))
+        except IntegrityError:
+            # Ту же категорию одновременно создал другой запрос — просто увеличиваем
+            db.rollback()
+            db.execute(update(CommentCategoryCount).where(CommentCategoryCount.category == category).values(**values))
+    db.commit()
+
+
+# ✍️ Обновление при записи: удаление отзывов (отзыв удалён сам или вместе с пользователем)
+def comment_removed(db: Session, category: str, count: int = 1):
+    db.execute(
+        update(CommentCategoryCount)
+        .where(CommentCategoryCount.category == category)
+        .values(count=func.max(CommentCategoryCount.count - count, 0), updated_at=datetime.utcnow())
+    )
+    db.commit()
+
+
+# 📖 Чтение агрегатов
+def comment_categories(db: Session) -> dict:
+    return {category: count for category, count in db.execute(
+        select(CommentCategoryCount.category, CommentCategoryCount.count)
+    )}
+
+
+def activity_by_day(db: Session, period: DateRange, user_id: int | None = None) -> list[dict]:
+    query = (
+        select(DailyUserActivity.day, func.sum(DailyUserActivity.uploads), func.sum(DailyUserActivity.scans))
+        .where(DailyUserActivity.day.between(period.date_from, period.date_to))
+        .group_by(DailyUserActivity.day)
+        .order_by(DailyUserActivity.day)
+    )
+    if user_id is not None:
+        query = query.where(DailyUserActivity.user_id == user_id)
+    return [{"day": day, "uploads": uploads, "scans": scans} for day, uploads, scans in db.execute(query)]
+
+
+def top_users(db: Session, period: DateRange, limit: int) -> list[dict]:
+    uploads = func.sum(DailyUserActivity.uploads).label("uploads")
+    query = (
+        select(DailyUserActivity.user_id, User.login, uploads, func.sum(DailyUserActivity.scans))
+        .outerjoin(User, User.id == DailyUserActivity.user_id)
+        .where(DailyUserActivity.day.between(period.date_from, period.date_to))
+        .group_by(DailyUserActivity.user_id, User.login)
+        .order_by(uploads.desc())
+        .limit(limit)
+    )
+    return [
+        {"user_id": user_id, "login": login, "uploads": total, "scans": scans}
+        for user_id, login, total, scans in db.execute(query)
+    ]
+
+
+def revenue_by_day(db: Session, period: DateRange) -> list[dict]:
+    query = (
+        select(DailyRevenue.day, DailyRevenue.subscription_id, Subscription.name,
+               DailyRevenue.currency, DailyRevenue.payments, DailyRevenue.amount)
+        .outerjoin(Subscription, Subscription.id == DailyRevenue.subscription_id)
+        .where(DailyRevenue.day.between(period.date_from, period.date_to))
+        .order_by(DailyRevenue.day, DailyRevenue.subscription_id)
+    )
+    return [
+        {"day": day, "subscription_id": sub_id, "plan": plan, "currency": currency, "payments": payments, "amount": amount}
+        for day, sub_id, plan, currency, payments, amount in db.execute(query)
+    ]
+
+
+def plan_mix_by_day(db: Session, period: DateRange) -> list[dict]:
+    query = (
+        select(DailyPlanMix.day, DailyPlanMix.subscription_id, Subscription.name, DailyPlanMix.active)
+        .outerjoin(Subscription, Subscription.id == DailyPlanMix.subscription_id)
+        .where(DailyPlanMix.day.between(period.date_from, period.date_to))
+        .order_by(DailyPlanMix.day, DailyPlanMix.subscription_id)
+    )
+    return [
+        {"day": day, "subscription_id": sub_id, "plan": plan, "active": active}
+        for day, sub_id, plan, active in db.execute(query)
+    ]
+
+
+# ♻️ Периодический пересчёт (запускается в lifespan)
+_refresher: asyncio.Task | None = None
+
+
+async def _refresh_loop():
+    while True:
+        try:
+            await run_in_threadpool(refresh_recent)
+        except Exception:
+            logger.exception("Не удалось пересчитать статистику")
+        await asyncio.sleep(STATS_REFRESH_INTERVAL)
+
+
+async def start_refresher():
+    global _refresher
+    if STATS_REFRESH_INTERVAL > 0 and _refresher is None:
+        _refresher = asyncio.create_task(_refresh_loop())
+
+
+async def stop_refresher():
+    global _refresher
+    if _refresher is not None:
+        _refresher.cancel()
+        await asyncio.gather(_refresher, return_exceptions=True)
+        _refresher = None
+
+
+if __name__ == "__main__":
+    # Полный пересчёт вручную: python -m utils.stats
+    db = SessionLocal()
+    try:
+        rebuild(db)
+    finally:
+        db.close()
+    print("✅ Статистика пересчитана.")
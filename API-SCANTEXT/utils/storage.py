@@ -0,0 +1,160 @@
+import mimetypes
+import os
+
+# 🗄 Хранилище загруженных файлов: локальная папка (по подпапкам) или S3-совместимое (AWS S3, MinIO...).
+# Имя файла — sha256 содержимого + расширение; ключ в хранилище — «ab/cd/<имя>» по первым символам хеша:
+# ни в одной папке не набирается миллион файлов, а S3 распределяет нагрузку по префиксам.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()  # local | s3
+# Внешний адрес API — из него строятся file_url и ссылки на превью
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000").rstrip("/")
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
+STORAGE_SHARD_DEPTH = int(os.getenv("STORAGE_SHARD_DEPTH", "2"))
+
+S3_BUCKET = os.getenv("S3_BUCKET", "scantext-uploads")
+S3_PREFIX = os.getenv("S3_PREFIX", "uploads/")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # MinIO и другие S3-совместимые: http://minio:9000
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+# Публичный адрес бакета/CDN; без него клиенты получают временную подписанную ссылку через редирект
+S3_PUBLIC_BASE_URL = (os.getenv("S3_PUBLIC_BASE_URL") or "").rstrip("/")
+S3_PRESIGN_SECONDS = int(os.getenv("S3_PRESIGN_SECONDS", "3600"))
+
+
+def shard_key(filename: str) -> str:
+    parts = [filename[i * 2:i * 2 + 2] for i in range(STORAGE_SHARD_DEPTH)]
+    return "/".join(parts + [filename])
+
+
+def _content_type(filename: str) -> str:
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+# 💽 Локальная папка. Раздаётся StaticFiles (/uploads в main.py) — байты не идут через обработчики API
+class LocalStorage:
+    def __init__(self, root: str = UPLOAD_FOLDER):
+        self.root = root
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.root, *shard_key(filename).split("/"))
+
+    def _find(self, filename: str) -> str | None:
+        # Файлы, загруженные до разбиения по подпапкам, лежат прямо в корне
+        for path in (self._path(filename), os.path.join(self.root, filename)):
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def temp_path(self, name: str) -> str:
+        folder = os.path.join(self.root, ".tmp")
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, name)
+
+    def put_file(self, temp_path: str, filename: str):
+        # Файл с тем же содержимым уже есть — временный не нужен
+        if self._find(filename):
+            os.remove(temp_path)
+            return
+        target = self._path(filename)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(temp_path, target)
+
+    def exists(self, filename: str) -> bool:
+        return self._find(filename) is not None
+
+    def read(self, filename: str) -> bytes:
+        path = self._find(filename)
+        if path is None:
+            raise FileNotFoundError(filename)
+        with open(path, "rb") as f:
+            return f.read()
+
+    def public_url(self, filename: str) -> str:
+        if not os.path.isfile(self._path(filename)) and os.path.isfile(os.path.join(self.root, filename)):
+            return f"{PUBLIC_BASE_URL}/uploads/{filename}"
+        return f"{PUBLIC_BASE_URL}/uploads/{shard_key(filename)}"
+
+    def download_url(self, filename: str) -> str:
+        return self.public_url(filename)
+
+
+# ☁️ S3-совместимое хранилище (boto3 — необязательная зависимость, нужна только для STORAGE_BACKEND=s3)
+class S3Storage:
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX, endpoint_url: str | None = S3_ENDPOINT_URL):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 требует пакет boto3 (pip install boto3)")
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client_error = ClientError
+        # Ключи доступа — из стандартных переменных AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=S3_REGION)
+        # Временные файлы загрузки — локально, до отправки в бакет
+        self._local = LocalStorage()
+
+    def _key(self, filename: str) -> str:
+        return self.prefix + shard_key(filename)
+
+    def temp_path(self, name: str) -> str:
+        return self._local.temp_path(name)
+
+    def put_file(self, temp_path: str, filename: str):
+        try:
+            if not self.exists(filename):
+                self.client.upload_file(
+                    temp_path, self.bucket, self._key(filename),
+                    ExtraArgs={"ContentType": _content_type(filename)}
+                )
+        finally:
+            os.remove(temp_path)
+
+    def exists(self, filename: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(filename))
+            return True
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def read(self, filename: str) -> bytes:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(filename))["Body"].read()
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(filename)
+            raise
+
+    def public_url(self, filename: str) -> str:
+        # Сохраняется в БД — поэтому постоянный адрес, а не подписанная ссылка с истекающим сроком
+        if S3_PUBLIC_BASE_URL:
+            return f"{S3_PUBLIC_BASE_URL}/{self._key(filename)}"
+        return f"{PUBLIC_BASE_URL}/upload/files/{filename}"
+
+    def download_url(self, filename: str) -> str:
+        # Подписанная ссылка: клиент качает файл напрямую из бакета, минуя API
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": self._key(filename)}, ExpiresIn=S3_PRESIGN_SECONDS
+        )
+
+
+_storage = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "s3":
+            _storage = S3Storage()
+        elif STORAGE_BACKEND == "local":
+            _storage = LocalStorage()
+        else:
+            raise RuntimeError(f"Неизвестный STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return _storage
+
+
+def set_storage(storage):
+    # Подмена хранилища (скрипты из tools/, временная папка)
+    global _storage
+    _storage = storage
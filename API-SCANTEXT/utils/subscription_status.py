@@ -0,0 +1,97 @@
+import os
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.subscription_models import Subscription, UserSubscription
+from models.user_models import User
+from utils import quota
+from utils.cache import TTLCache
+
+# ⚙️ Кэш статуса подписки: фронтенд опрашивает его на каждой странице
+SUBSCRIPTION_CACHE_TTL = float(os.getenv("SUBSCRIPTION_CACHE_TTL", "30"))
+SUBSCRIPTION_CACHE_SIZE = int(os.getenv("SUBSCRIPTION_CACHE_SIZE", "10000"))
+
+# Ответ для пользователя без активной подписки
+NO_SUBSCRIPTION = {"subscription_type": "none", "remaining_scans": 0}
+
+# user_id -> статус активной подписки (None — подписки нет), login -> user_id
+status_cache = TTLCache(SUBSCRIPTION_CACHE_TTL, SUBSCRIPTION_CACHE_SIZE)
+login_cache = TTLCache(SUBSCRIPTION_CACHE_TTL, SUBSCRIPTION_CACHE_SIZE)
+
+_NONE = object()
+
+
+def _load_status(db: Session, user_id: int) -> dict | None:
+    row = db.execute(
+        select(Subscription.name, UserSubscription.remaining_scans)
+        .join(Subscription, Subscription.id == UserSubscription.subscription_id)
+        .where(UserSubscription.user_id == user_id, UserSubscription.is_active == True)
+    ).first()
+    if row is None:
+        return None
+    return {"subscription_type": row.name, "remaining_scans": row.remaining_scans or 0}
+
+
+# 📊 Статус активной подписки пользователя (None — активной подписки нет)
+def get_status(db: Session, user_id: int) -> dict | None:
+    status = status_cache.get(user_id, _NONE)
+    if status is _NONE:
+        status = _load_status(db, user_id)
+        status_cache.set(user_id, status)
+    if status is None:
+        return None
+
+    status = dict(status)
+    # Со счётчиком лимита в памяти актуальный остаток — там, а не в БД
+    if quota.QUOTA_CACHE_ENABLED:
+        remaining = quota.counter.remaining(user_id)
+        if remaining is not None:
+            status["remaining_scans"] = remaining
+    return status
+
+
+def get_user_id(db: Session, login: str) -> int | None:
+    user_id = login_cache.get(login)
+    if user_id is None:
+        user_id = db.execute(select(User.id).where(User.login == login)).scalar()
+        if user_id is not None:
+            login_cache.set(login, user_id)
+    return user_id
+
+
+# Статус по логину: (user_id, статус); user_id None — пользователь не найден
+def get_status_by_login(db: Session, login: str) -> tuple[int | None, dict | None]:
+    user_id = get_user_id(db, login)
+    if user_id is None:
+        return None, None
+    return user_id, get_status(db, user_id)
+
+
+# 🧹 Инвалидация
+def update_remaining(user_id: int, remaining_scans: int):
+    # Списание с известным новым остатком — правим запись на месте, без лишнего промаха
+    status = status_cache.peek(user_id)
+    if status is not None:
+        status_cache.set(user_id, {**status, "remaining_scans": remaining_scans})
+
+
+def invalidate(user_id: int):
+    # Изменился остаток сканирований (возврат)
+    status_cache.pop(user_id)
+
+
+def subscription_changed(user_id: int):
+    # Сменилась активная подписка (оплата, активация, смена тарифа)
+    quota.invalidate(user_id)
+    status_cache.pop(user_id)
+
+
+def forget_user(user_id: int):
+    # Пользователь удалён: логин может достаться новому пользователю
+    status_cache.pop(user_id)
+    login_cache.discard_values(user_id)
+
+
+def stats() -> dict:
+    return {"status": status_cache.stats(), "login": login_cache.stats()}
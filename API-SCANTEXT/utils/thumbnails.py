@@ -0,0 +1,109 @@
+import hashlib
+import io
+import os
+import threading
+import uuid
+
+from fastapi import HTTPException
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from utils import uploads
+
+# 🖼 Превью загруженных изображений: миниатюра для истории и средний размер для просмотра.
+# Создаются при первом запросе и кэшируются на диске. Имя файла — sha256 содержимого оригинала
+# + размер + настройки, поэтому готовое превью не меняется никогда (сильный ETag, immutable-кэш).
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "256"))
+MEDIUM_SIZE = int(os.getenv("MEDIUM_SIZE", "1024"))
+DERIVATIVE_FORMAT = os.getenv("DERIVATIVE_FORMAT", "WEBP").upper()  # WEBP | JPEG
+DERIVATIVE_QUALITY = int(os.getenv("DERIVATIVE_QUALITY", "80"))
+DERIVATIVE_FOLDER = os.getenv("DERIVATIVE_FOLDER", "derivatives")
+DERIVATIVE_CACHE_SECONDS = int(os.getenv("DERIVATIVE_CACHE_SECONDS", str(365 * 24 * 3600)))
+
+VARIANTS = {"thumb": THUMBNAIL_SIZE, "medium": MEDIUM_SIZE}
+MEDIA_TYPE = "image/webp" if DERIVATIVE_FORMAT == "WEBP" else "image/jpeg"
+CACHE_CONTROL = f"public, max-age={DERIVATIVE_CACHE_SECONDS}, immutable"
+
+# Одно превью не считаем параллельно в нескольких потоках (первый запрос истории — десятки плиток)
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def derivative_url(filename: str, variant: str) -> str:
+    return f"{uploads.API_BASE_URL}/upload/files/{filename}/{variant}"
+
+
+def _check(filename: str, variant: str):
+    if variant not in VARIANTS:
+        raise HTTPException(status_code=404, detail="Неизвестный размер превью")
+    if os.path.basename(filename) != filename or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+
+
+def _key(filename: str, variant: str) -> str:
+    # Новые файлы уже названы sha256 содержимого; у старых берём хеш имени (файл не перезаписывается)
+    stem = os.path.splitext(filename)[0]
+    if len(stem) != 64:
+        stem = hashlib.sha256(filename.encode()).hexdigest()
+    settings = f"{VARIANTS[variant]}-{DERIVATIVE_FORMAT}-{DERIVATIVE_QUALITY}"
+    return f"{stem}_{settings}"
+
+
+def etag(filename: str, variant: str) -> str:
+    _check(filename, variant)
+    return f'"{_key(filename, variant)}"'
+
+
+def etag_matches(if_none_match: str | None, tag: str) -> bool:
+    # If-None-Match: "a", W/"b" или *
+    if not if_none_match:
+        return False
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return "*" in candidates or tag in candidates
+
+
+def _path(key: str) -> str:
+    # Подпапки по первым символам хеша — без десятков тысяч файлов в одной папке
+    extension = ".webp" if DERIVATIVE_FORMAT == "WEBP" else ".jpg"
+    return os.path.join(DERIVATIVE_FOLDER, key[:2], key + extension)
+
+
+def _render(source: bytes, target: str, max_side: int):
+    with Image.open(io.BytesIO(source)) as original:
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = f"{target}.{uuid.uuid4().hex}.part"
+        if DERIVATIVE_FORMAT == "WEBP":
+            image.save(temp_path, format="WEBP", quality=DERIVATIVE_QUALITY, method=4)
+        else:
+            image.save(temp_path, format="JPEG", quality=DERIVATIVE_QUALITY, optimize=True, progressive=True)
+        os.replace(temp_path, target)
+
+
+# 📦 Путь к готовому превью (создаётся при первом обращении). Вызывать в threadpool.
+def get_derivative(filename: str, variant: str) -> str:
+    _check(filename, variant)
+    key = _key(filename, variant)
+    target = _path(key)
+    if os.path.exists(target):
+        return target
+
+    with _locks_guard:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        if not os.path.exists(target):
+            # Оригинал — из хранилища (локальная папка или S3); превью кэшируются на локальном диске
+            try:
+                source = uploads.read_upload_bytes(filename)
+            except FileNotFoundError:
+                raise HTTPException(status_code=404, detail="Файл не найден")
+            try:
+                _render(source, target, VARIANTS[variant])
+            except (UnidentifiedImageError, OSError):
+                raise HTTPException(status_code=415, detail="Не удалось построить превью для этого файла")
+    with _locks_guard:
+        _locks.pop(key, None)
+    return target
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import uuid
+
+from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from utils.storage import PUBLIC_BASE_URL, get_storage
+
+# ⚙️ Запись файлов кусками: память на загрузку ограничена размером куска
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+
+# Адрес API, по которому клиенты открывают файлы (PUBLIC_BASE_URL)
+API_BASE_URL = PUBLIC_BASE_URL
+
+
+def upload_file_url(filename: str) -> str:
+    return get_storage().public_url(filename)
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Файл слишком большой (максимум {UPLOAD_MAX_BYTES // (1024 * 1024)} МБ)"
+    )
+
+
+# 🔍 Тип изображения — по первым байтам содержимого, а не по имени файла от клиента:
+# одинаковое содержимое всегда получает одно имя, а .html под видом картинки в хранилище не попадает
+def _image_extension(head: bytes) -> str | None:
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return ".tiff"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if head[:2] == b"BM":
+        return ".bmp"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"):
+            return ".heic"
+        if brand in (b"avif", b"avis"):
+            return ".avif"
+    return None
+
+
+# Формат не распознан по содержимому — расширение из имени файла от клиента (как раньше),
+# но активное в браузере содержимое (/uploads раздаётся как статика) хранится как .bin
+_ACTIVE_EXTENSIONS = {".html", ".htm", ".xhtml", ".shtml", ".svg", ".svgz", ".xml", ".xsl", ".js", ".mjs"}
+
+
+def _client_extension(original_name: str | None) -> str:
+    extension = os.path.splitext(original_name or "")[1].lower()
+    if not 2 <= len(extension) <= 9 or not extension[1:].isalnum() or extension in _ACTIVE_EXTENSIONS:
+        return ".bin"
+    return extension
+
+
+# 💾 Потоковое сохранение загруженного файла: во временный файл, затем в хранилище (utils/storage.py).
+# Файл хранится под именем sha256 содержимого: одинаковые изображения — один файл.
+# Возвращает имя файла и sha256 содержимого (считается на лету).
+async def save_upload_file(file: UploadFile) -> tuple[str, str]:
+    if file.size is not None and file.size > UPLOAD_MAX_BYTES:
+        raise _too_large()
+
+    storage = get_storage()
+    temp_path = await run_in_threadpool(storage.temp_path, f"{uuid.uuid4().hex}.part")
+
+    digest = hashlib.sha256()
+    size = 0
+    extension = None
+    out = await run_in_threadpool(open, temp_path, "wb")
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            if extension is None:
+                extension = _image_extension(chunk) or _client_extension(file.filename)
+            size += len(chunk)
+            if size > UPLOAD_MAX_BYTES:
+                raise _too_large()
+            digest.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+        if extension is None:
+            # Пустой файл
+            extension = _client_extension(file.filename)
+    except BaseException:
+        await run_in_threadpool(out.close)
+        await run_in_threadpool(os.remove, temp_path)
+        raise
+
+    await run_in_threadpool(out.close)
+
+    content_hash = digest.hexdigest()
+    filename = f"{content_hash}{extension}"
+    # ♻️ Такой файл уже есть — хранилище оставит существующий
+    await run_in_threadpool(storage.put_file, temp_path, filename)
+    return filename, content_hash
+
+
+def read_upload_bytes(filename: str) -> bytes:
+    return get_storage().read(filename)
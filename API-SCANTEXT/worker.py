@@ -0,0 +1,27 @@
+# 🛠 Отдельный процесс-воркер OCR-очереди
+# Запуск: OCR_JOB_MODE=external python worker.py (API запускать с тем же OCR_JOB_MODE)
+import asyncio
+import logging
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from db.migrations import run_migrations
+from models import admin_models, user_models, comment_models, upload_models, subscription_models, payment_models, ocr_job_models
+from utils import ocr_backends, ocr_jobs, image_preprocessing
+
+
+async def main():
+    try:
+        await ocr_jobs.run_polling_worker()
+    finally:
+        await ocr_backends.close_backend()
+        image_preprocessing.shutdown_pool()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_migrations()
+    print(f"🛠 OCR-воркер запущен, параллельных задач: {ocr_jobs.OCR_WORKERS}")
+    asyncio.run(main())